@@ -0,0 +1,340 @@
+# bench_monitoring.py
+#
+# 量度 monitoring 掃描 / 觸發路徑各階段的效能：
+#   - legacy_scan:      原本的 os.listdir + os.path.isfile + os.path.getmtime + re.search 做法
+#   - snapshot_cold:    FolderScanner 第一次掃描（全部檔案都係新增）
+#   - snapshot_warm:    FolderScanner 之後的增量掃描（按 --churn 比例修改檔案）
+#   - classify_regex:   每個檔名逐個 pattern re.search
+#   - classify_cached:  FileClassifier（合併 pattern + 檔名 cache）
+#   - cooldown_restat:  冷卻期間只重新 stat Group A 檔案
+#   - state_tick:       FolderState 狀態推進（pending → cooling → 完成）
+#
+# 用法：
+#   python benchmarks/bench_monitoring.py --sizes 10,1000,100000 --patterns 12 --churn 0.01
+#   python benchmarks/bench_monitoring.py --stat-latency-ms 2 --sizes 100,1000      # 模擬 network share
+#   python benchmarks/bench_monitoring.py --output new.json --compare old.json       # 比較兩次結果
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_dir = os.path.dirname(current_dir)
+if project_dir not in sys.path:
+    sys.path.append(project_dir)
+
+from classifier import FileClassifier
+from snapshot import FolderScanner
+from folder_state import FolderState, PENDING, COOLING
+
+
+# --- 模擬慢速檔案系統 ---
+class _SlowDirEntry:
+    def __init__(self, entry, stat_latency, stat_cached):
+        self._entry = entry
+        self._stat_latency = stat_latency
+        self._stat_cached = stat_cached
+        self.name = entry.name
+        self.path = entry.path
+
+    def is_file(self, *args, **kwargs):
+        return self._entry.is_file(*args, **kwargs)
+
+    def is_dir(self, *args, **kwargs):
+        return self._entry.is_dir(*args, **kwargs)
+
+    def stat(self, *args, **kwargs):
+        if not self._stat_cached:
+            time.sleep(self._stat_latency)
+        return self._entry.stat(*args, **kwargs)
+
+
+class _SlowScandir:
+    def __init__(self, iterator, stat_latency, stat_cached):
+        self._iterator = iterator
+        self._stat_latency = stat_latency
+        self._stat_cached = stat_cached
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._iterator.close()
+
+    def __iter__(self):
+        for entry in self._iterator:
+            yield _SlowDirEntry(entry, self._stat_latency, self._stat_cached)
+
+
+@contextmanager
+def simulated_latency(stat_latency=0.0, list_latency=0.0, scandir_stat_cached=False):
+    # 每次 stat / 列出資料夾都加上延遲；scandir_stat_cached 模擬 Windows（DirEntry 已附帶 stat 資料）
+    if not stat_latency and not list_latency:
+        yield
+        return
+    original_stat, original_listdir, original_scandir = os.stat, os.listdir, os.scandir
+
+    def slow_stat(*args, **kwargs):
+        time.sleep(stat_latency)
+        return original_stat(*args, **kwargs)
+
+    def slow_listdir(*args, **kwargs):
+        time.sleep(list_latency)
+        return original_listdir(*args, **kwargs)
+
+    def slow_scandir(*args, **kwargs):
+        time.sleep(list_latency)
+        return _SlowScandir(original_scandir(*args, **kwargs), stat_latency, scandir_stat_cached)
+
+    os.stat, os.listdir, os.scandir = slow_stat, slow_listdir, slow_scandir
+    try:
+        yield
+    finally:
+        os.stat, os.listdir, os.scandir = original_stat, original_listdir, original_scandir
+
+
+# --- 產生測試資料 ---
+def make_patterns(count):
+    group_a = [f"Data - Section{i:02d}" for i in range(max(count // 2, 1))]
+    group_b = [f"^Summary{i:02d} .*\\.xlsx$" for i in range(max(count - len(group_a), 1))]
+    return group_a, group_b
+
+
+def make_file_names(count, group_a, group_b):
+    # 大約 10% Group A、10% Group B，其餘係唔相關檔案
+    names = []
+    for i in range(count):
+        bucket = i % 10
+        if bucket == 0:
+            names.append(f"{group_a[(i // 10) % len(group_a)]} {i}.xlsx")
+        elif bucket == 1:
+            names.append(f"Summary{(i // 10) % len(group_b):02d} {i}.xlsx")
+        else:
+            names.append(f"Unrelated report {i}.xlsx")
+    return names
+
+
+def create_folder(root, file_names):
+    base_time = time.time() - 3600
+    for index, file_name in enumerate(file_names):
+        file_path = os.path.join(root, file_name)
+        with open(file_path, "wb"):
+            pass
+        os.utime(file_path, (base_time + index, base_time + index))
+
+
+def churn_folder(root, file_names, churn, rng):
+    if churn <= 0:
+        return 0
+    touched = rng.sample(file_names, max(int(len(file_names) * churn), 1))
+    now = time.time()
+    for file_name in touched:
+        os.utime(os.path.join(root, file_name), (now, now))
+    return len(touched)
+
+
+# --- 各階段 ---
+def legacy_scan(folder_path, group_a, group_b):
+    group_a_last_times = {}
+    group_b_last_times = {}
+    for file_name in os.listdir(folder_path):
+        file_path = os.path.join(folder_path, file_name)
+        if os.path.isfile(file_path):
+            last_time = os.path.getmtime(file_path)
+            for pattern in group_a:
+                if re.search(pattern, file_name):
+                    group_a_last_times[file_name] = last_time
+                    break
+            for pattern in group_b:
+                if re.search(pattern, file_name):
+                    group_b_last_times[file_name] = last_time
+                    break
+    newest = max(group_a_last_times.values()) if group_a_last_times else 0
+    oldest = min(group_b_last_times.values()) if group_b_last_times else float("inf")
+    return newest, oldest
+
+
+def classify_regex(file_names, group_a, group_b):
+    for file_name in file_names:
+        any(re.search(pattern, file_name) for pattern in group_a)
+        any(re.search(pattern, file_name) for pattern in group_b)
+
+
+def classify_cached(classifier, file_names):
+    for file_name in file_names:
+        classifier.classify(file_name)
+
+
+def timed(func, repeat):
+    durations = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        durations.append(time.perf_counter() - started)
+    return durations, result
+
+
+def run_case(size, args, rng):
+    group_a, group_b = make_patterns(args.patterns)
+    file_names = make_file_names(size, group_a, group_b)
+    root = tempfile.mkdtemp(prefix="bench_monitoring_")
+    rows = []
+
+    def record(stage, durations, extra=None):
+        row = {
+            "stage": stage,
+            "files": len(file_names),
+            "patterns": len(group_a) + len(group_b),
+            "churn": args.churn,
+            "stat_latency_ms": args.stat_latency_ms,
+            "min_seconds": min(durations),
+            "median_seconds": statistics.median(durations),
+            "per_file_us": min(durations) / max(len(file_names), 1) * 1e6,
+        }
+        row.update(extra or {})
+        rows.append(row)
+        print(f"  {stage:<17} files={row['files']:>7}  min={row['min_seconds'] * 1000:>10.3f} ms  "
+              f"per file={row['per_file_us']:>8.3f} us")
+
+    try:
+        create_folder(root, file_names)
+        latency = dict(
+            stat_latency=args.stat_latency_ms / 1000.0,
+            list_latency=args.list_latency_ms / 1000.0,
+            scandir_stat_cached=args.scandir_stat_cached,
+        )
+
+        with simulated_latency(**latency):
+            durations, _ = timed(lambda: legacy_scan(root, group_a, group_b), args.repeat)
+        record("legacy_scan", durations)
+
+        scanners = []
+
+        def cold_scan():
+            scanner = FolderScanner(root, FileClassifier(group_a, group_b))
+            scanner.scan()
+            scanners.append(scanner)
+            return scanner
+
+        with simulated_latency(**latency):
+            durations, scanner = timed(cold_scan, args.repeat)
+        record("snapshot_cold", durations, {"stat_calls": scanner.last_stat_calls})
+
+        warm_durations = []
+        changed = 0
+        for _ in range(args.repeat):
+            churn_folder(root, file_names, args.churn, rng)
+            with simulated_latency(**latency):
+                started = time.perf_counter()
+                diff = scanner.scan()
+                warm_durations.append(time.perf_counter() - started)
+            changed = len(diff.added) + len(diff.removed) + len(diff.modified)
+        record("snapshot_warm", warm_durations, {"stat_calls": scanner.last_stat_calls, "changed_files": changed})
+
+        durations, _ = timed(lambda: classify_regex(file_names, group_a, group_b), args.repeat)
+        record("classify_regex", durations)
+        classifier = FileClassifier(group_a, group_b)
+        classify_cached(classifier, file_names)
+        durations, _ = timed(lambda: classify_cached(classifier, file_names), args.repeat)
+        record("classify_cached", durations)
+
+        state = FolderState(root, updating_script_path=None)
+        state.mark_pending(scanner.group_a.times, scanner.group_a.extreme() or 0)
+        state.start_cooldown()
+        with simulated_latency(**latency):
+            durations, _ = timed(state.restat_group_a, args.repeat)
+        record("cooldown_restat", durations, {"stat_calls": state.last_restat_calls})
+
+        def state_ticks():
+            for _ in range(1000):
+                state.transition(PENDING)
+                state.start_cooldown()
+                state.cooldown_remaining(0)
+                if state.phase != COOLING:
+                    raise RuntimeError("unexpected phase")
+
+        durations, _ = timed(state_ticks, args.repeat)
+        record("state_tick", durations, {"ticks": 1000})
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return rows
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=project_dir, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def compare_results(rows, baseline_path):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    baseline_rows = {
+        (row["stage"], row["files"], row["patterns"], row["stat_latency_ms"]): row
+        for row in baseline.get("results", [])
+    }
+    print(f"\nComparison against {baseline_path} (revision {baseline.get('revision')}):")
+    for row in rows:
+        old = baseline_rows.get((row["stage"], row["files"], row["patterns"], row["stat_latency_ms"]))
+        if old is None or not old["min_seconds"]:
+            continue
+        ratio = row["min_seconds"] / old["min_seconds"]
+        print(f"  {row['stage']:<17} files={row['files']:>7}  {old['min_seconds'] * 1000:>10.3f} ms -> "
+              f"{row['min_seconds'] * 1000:>10.3f} ms  ({ratio:.2f}x)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the monitoring scan and trigger path.")
+    parser.add_argument("--sizes", default="10,100,1000,10000,100000", help="Comma-separated file counts per folder")
+    parser.add_argument("--patterns", type=int, default=12, help="Total number of Group A + Group B patterns")
+    parser.add_argument("--churn", type=float, default=0.01, help="Fraction of files modified between warm scans")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions per stage")
+    parser.add_argument("--stat-latency-ms", type=float, default=0.0, help="Simulated latency added to every stat call")
+    parser.add_argument("--list-latency-ms", type=float, default=0.0, help="Simulated latency added to every directory listing")
+    parser.add_argument("--scandir-stat-cached", action="store_true",
+                        help="Do not add stat latency to DirEntry.stat() (as on Windows, where scandir returns stat data)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Previous JSON results to compare against")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    results = []
+    for size in sizes:
+        print(f"\n📂 {size} files, {args.patterns} patterns, churn {args.churn}, stat latency {args.stat_latency_ms} ms")
+        results.extend(run_case(size, args, rng))
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "parameters": vars(args),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n📄 Results written to {args.output}")
+    if args.compare:
+        compare_results(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+# bench_updating.py
+#
+# 用模擬 Excel（simulated_excel.py）量度 updating.py 整個更新流程的效能，唔使 Windows / Excel：
+#   - cold:         全部 workbook 強制更新（force=True）
+#   - incremental:  修改 --churn 比例的來源 workbook 之後再更新一次（只有受影響的 workbook 需要更新）
+# workbook 分成 --layers 層，每層的 workbook 連結去上一層 --links 個 workbook（真正的 xlsx 外部連結），
+# 所以排程（wave）、並行、重試及增量更新都會按真實情況運作。
+# 每個 Excel 操作的時間 = simulated_excel.DEFAULT_LATENCIES × --time-scale。
+#
+# 用法：
+#   python benchmarks/bench_updating.py --workbooks 24 --layers 3 --parallel 1,2,4
+#   python benchmarks/bench_updating.py --failure-rate 0.05 --max-retries 3            # 模擬 Excel 間中出錯
+#   python benchmarks/bench_updating.py --output new.json --compare old.json           # 比較兩次結果
+
+import os
+import sys
+import json
+import time
+import logging
+import random
+import shutil
+import zipfile
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+
+import yaml
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_dir = os.path.dirname(current_dir)
+if project_dir not in sys.path:
+    sys.path.append(project_dir)
+
+from log_pipeline import get_pipeline, get_logger
+from update_worker import load_update_module
+
+UPDATING_SCRIPT_PATH = os.path.join(project_dir, "updating.py")
+
+
+# --- 產生測試用 workbook ---
+def workbook_xml_parts(links, connections, modified, value):
+    content_types = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                     '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types"/>')
+    workbook = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"/>')
+    core = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" '
+            'xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:dcterms="http://purl.org/dc/terms/">'
+            '<dc:creator>bench</dc:creator><cp:lastModifiedBy>bench</cp:lastModifiedBy>'
+            f'<dcterms:modified>{modified}</dcterms:modified></cp:coreProperties>')
+    sheet = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+             '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+             f'<sheetData><row r="1"><c r="A1"><v>{value}</v></c></row></sheetData></worksheet>')
+    parts = {"[Content_Types].xml": content_types, "xl/workbook.xml": workbook, "docProps/core.xml": core,
+             "xl/worksheets/sheet1.xml": sheet}
+    for index, link_path in enumerate(links, 1):
+        parts[f"xl/externalLinks/_rels/externalLink{index}.xml.rels"] = (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/externalLinkPath" '
+            f'Target="file:///{link_path.lstrip("/")}" TargetMode="External"/></Relationships>')
+    if connections:
+        parts["xl/connections.xml"] = (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<connections xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            + "".join(f'<connection id="{index}" name="Query{index}"/>' for index in range(1, connections + 1))
+            + '</connections>')
+    return parts
+
+
+def write_workbook(file_path, links, connections=0):
+    modified = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    with zipfile.ZipFile(file_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in workbook_xml_parts(links, connections, modified, time.time_ns()).items():
+            archive.writestr(name, data)
+
+
+def create_workbooks(data_directory, args, rng):
+    # 回傳 (layers, links)：layers[k] = 第 k 層的檔案路徑
+    per_layer = max(args.workbooks // args.layers, 1)
+    layers = []
+    links = {}
+    for layer in range(args.layers):
+        paths = [os.path.join(data_directory, f"L{layer} Book {index:03d}.xlsx") for index in range(per_layer)]
+        for file_path in paths:
+            sources = rng.sample(layers[-1], min(args.links, len(layers[-1]))) if layers else []
+            connections = 1 if rng.random() < args.connection_ratio else 0
+            links[file_path] = (sources, connections)
+            write_workbook(file_path, sources, connections)
+        layers.append(paths)
+    return layers, links
+
+
+def write_config(root, data_directory, args, layers):
+    failure_rates = {operation: args.failure_rate for operation in ("open", "update_link", "refresh_connection", "save")}
+    config = {
+        "email_recipients": {"to": [], "cc": [], "bcc": []},
+        "email_subject_prefix": "Benchmark",
+        "log_directory": os.path.join(root, "log"),
+        "base_directory": data_directory,
+        "file_configs": {f"L{layer} ": {"macro": None, "open_password": None, "write_password": None}
+                         for layer in range(len(layers))},
+        "advanced_settings": {
+            "max_retries": args.max_retries,
+            "retry_delay_base": 1,
+            "excel_visible": False,
+            "force_calculation": True,
+            "excel_session_max_workbooks": args.session_max_workbooks,
+            "max_parallel_workbooks": 1,
+            "incremental_refresh": True,
+            "refresh_ledger": None,
+            "automation_backend": "simulated",
+            "simulated_excel": {
+                "seed": args.seed,
+                "jitter": 0.1,
+                "time_scale": args.time_scale,
+                "failure_rates": failure_rates,
+            },
+        },
+    }
+    with open(os.path.join(root, "updating_config.yaml"), "w", encoding="utf-8") as f:
+        yaml.safe_dump(config, f, allow_unicode=True, sort_keys=False)
+
+
+def churn_workbooks(layers, links, churn, rng):
+    # 修改第一層（冇連結的來源檔）部分 workbook 的儲存格內容（只改 docProps 唔算內容改變）
+    if churn <= 0:
+        return 0
+    changed = rng.sample(layers[0], max(int(len(layers[0]) * churn), 1))
+    for file_path in changed:
+        sources, connections = links[file_path]
+        write_workbook(file_path, sources, connections)
+    return len(changed)
+
+
+def run_batch(module, data_directory, parallel, force):
+    module.advanced_settings["max_parallel_workbooks"] = parallel
+    started = time.perf_counter()
+    summary = module.process_excel_files_in_directory(data_directory, module.file_configs, force=force)
+    return time.perf_counter() - started, summary
+
+
+def run_case(module, data_directory, layers, links, parallel, args, rng):
+    rows = []
+    workbook_count = sum(len(paths) for paths in layers)
+
+    def record(stage, durations, summary, extra=None):
+        row = {
+            "stage": stage,
+            "workbooks": workbook_count,
+            "parallel": parallel,
+            "time_scale": args.time_scale,
+            "failure_rate": args.failure_rate,
+            "min_seconds": min(durations),
+            "median_seconds": statistics.median(durations),
+            "per_workbook_ms": min(durations) / max(workbook_count, 1) * 1000,
+            "processed": len(summary["processed"]),
+            "failed": len(summary["failed"]),
+            "up_to_date": len(summary["up_to_date"]),
+        }
+        row.update(extra or {})
+        rows.append(row)
+        print(f"  {stage:<12} parallel={parallel:>2}  min={row['min_seconds']:>8.2f} s  "
+              f"per workbook={row['per_workbook_ms']:>8.1f} ms  processed={row['processed']:>4}  "
+              f"failed={row['failed']:>3}  up to date={row['up_to_date']:>4}")
+
+    durations = []
+    summary = None
+    for _ in range(args.repeat):
+        duration, summary = run_batch(module, data_directory, parallel, force=True)
+        durations.append(duration)
+    record("cold", durations, summary)
+
+    durations = []
+    changed = 0
+    for _ in range(args.repeat):
+        changed = churn_workbooks(layers, links, args.churn, rng)
+        duration, summary = run_batch(module, data_directory, parallel, force=False)
+        durations.append(duration)
+    record("incremental", durations, summary, {"changed_sources": changed})
+    return rows
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=project_dir, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def compare_results(rows, baseline_path):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    baseline_rows = {
+        (row["stage"], row["workbooks"], row["parallel"], row["time_scale"], row["failure_rate"]): row
+        for row in baseline.get("results", [])
+    }
+    print(f"\nComparison against {baseline_path} (revision {baseline.get('revision')}):")
+    for row in rows:
+        old = baseline_rows.get((row["stage"], row["workbooks"], row["parallel"], row["time_scale"], row["failure_rate"]))
+        if old is None or not old["min_seconds"]:
+            continue
+        ratio = row["min_seconds"] / old["min_seconds"]
+        print(f"  {row['stage']:<12} parallel={row['parallel']:>2}  {old['min_seconds']:>8.2f} s -> "
+              f"{row['min_seconds']:>8.2f} s  ({ratio:.2f}x)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Excel refresh pipeline against a simulated Excel.")
+    parser.add_argument("--workbooks", type=int, default=24, help="Total number of workbooks")
+    parser.add_argument("--layers", type=int, default=3, help="Number of link layers (each layer links to the previous one)")
+    parser.add_argument("--links", type=int, default=2, help="External links per workbook")
+    parser.add_argument("--connection-ratio", type=float, default=0.1, help="Fraction of workbooks with a data connection")
+    parser.add_argument("--parallel", default="1,2,4", help="Comma-separated max_parallel_workbooks values")
+    parser.add_argument("--churn", type=float, default=0.1, help="Fraction of first-layer workbooks modified before an incremental run")
+    parser.add_argument("--time-scale", type=float, default=0.01, help="Multiplier applied to the simulated Excel latencies")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Failure probability of open / update_link / refresh_connection / save")
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--session-max-workbooks", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions per stage")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep", action="store_true", help="Keep the generated workbooks")
+    parser.add_argument("--output", default="bench_updating_results.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Previous JSON results to compare against")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    output_path = os.path.abspath(args.output)
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    root = tempfile.mkdtemp(prefix="bench_updating_")
+    data_directory = os.path.join(root, "data")
+    os.makedirs(data_directory)
+    original_directory = os.getcwd()
+    results = []
+    try:
+        layers, links = create_workbooks(data_directory, args, rng)
+        write_config(root, data_directory, args, layers)
+        # updating.py 喺目前目錄讀取 updating_config.yaml
+        os.chdir(root)
+        module = load_update_module(UPDATING_SCRIPT_PATH, force_reload=True)
+        # 每個檔案的處理訊息唔輸出到 console（NullHandler 避免 warning 經 logging.lastResort 輸出）
+        get_pipeline().detach()
+        get_logger("updating").addHandler(logging.NullHandler())
+        print(f"\n📂 {sum(len(paths) for paths in layers)} workbooks in {args.layers} layer(s), {args.links} link(s) each, "
+              f"time scale {args.time_scale}, failure rate {args.failure_rate}")
+        for parallel in [int(value) for value in args.parallel.split(",") if value.strip()]:
+            results.extend(run_case(module, data_directory, layers, links, parallel, args, rng))
+    finally:
+        os.chdir(original_directory)
+        if args.keep:
+            print(f"\n📁 Generated workbooks kept in {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "parameters": vars(args),
+        "results": results,
+    }
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n📄 Results written to {output_path}")
+    if compare_path:
+        compare_results(results, compare_path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+import re
+
+# --- Group A/B 檔名分類 ---
+# 每組 pattern 只 compile 一次，可以的話合併成一個 alternation；
+# 每個檔名的分類結果會 cache 起來，檔案消失時再從 cache 移除。
+
+# 含 backreference 或 inline flag 的 pattern 合併後意思會變，要分開 compile
+_UNMERGEABLE = re.compile(r"\\[1-9]|\(\?P=|\(\?[aiLmsux-]+\)")
+
+
+def compile_group(patterns):
+    patterns = list(patterns or [])
+    if not patterns:
+        return []
+    if len(patterns) > 1 and not any(_UNMERGEABLE.search(p) for p in patterns):
+        try:
+            return [re.compile("|".join(f"(?:{p})" for p in patterns))]
+        except re.error:
+            pass
+    return [re.compile(p) for p in patterns]
+
+
+class FileClassifier:
+    def __init__(self, file_group_a, file_group_b):
+        self.file_group_a = list(file_group_a or [])
+        self.file_group_b = list(file_group_b or [])
+        self._group_a = compile_group(self.file_group_a)
+        self._group_b = compile_group(self.file_group_b)
+        self._cache = {}
+
+    @staticmethod
+    def _matches(compiled_patterns, file_name):
+        for pattern in compiled_patterns:
+            if pattern.search(file_name):
+                return True
+        return False
+
+    def classify(self, file_name):
+        groups = self._cache.get(file_name)
+        if groups is None:
+            groups = (self._matches(self._group_a, file_name), self._matches(self._group_b, file_name))
+            self._cache[file_name] = groups
+        return groups
+
+    def forget(self, file_name):
+        self._cache.pop(file_name, None)
+
+    def retain(self, file_names):
+        # 只保留仍然存在的檔名，其餘從 cache 移除
+        # （呼叫前 file_names 已全部 classify 過，所以數量相同即代表沒有檔案消失）
+        if len(self._cache) == len(file_names):
+            return
+        for file_name in [name for name in self._cache if name not in file_names]:
+            del self._cache[file_name]
+
+    def same_patterns(self, file_group_a, file_group_b):
+        return self.file_group_a == list(file_group_a or []) and self.file_group_b == list(file_group_b or [])
@@ -0,0 +1,88 @@
+import os
+import re
+import yaml
+from fingerprint import MODES
+
+# --- monitoring_config.yaml 熱重載 ---
+# 定期檢查 config 檔的修改時間；有變動就重新讀取及驗證，驗證通過先交俾監控 loop 套用，
+# 有錯誤就保留現有設定，等下次修改再試。
+
+NUMERIC_SETTINGS = ("check_interval", "max_check_interval", "poll_backoff_factor", "cooldown_period",
+                    "watcher_rescan_interval", "scan_workers", "max_concurrent_updates")
+
+
+def read_config_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)
+
+
+def validate_monitoring_config(config):
+    errors = []
+    if not isinstance(config, dict):
+        return ["Config file is empty or not a mapping"]
+    folders = config.get("folders") or []
+    if not isinstance(folders, list):
+        errors.append("folders must be a list")
+        folders = []
+    seen = set()
+    for index, folder in enumerate(folders):
+        if not isinstance(folder, dict) or not folder.get("folder_path") or not folder.get("updating_script"):
+            errors.append(f"folders[{index}] needs folder_path and updating_script")
+            continue
+        folder_path = os.path.expandvars(folder["folder_path"])
+        if folder_path in seen:
+            errors.append(f"Folder listed more than once: {folder_path}")
+        seen.add(folder_path)
+        updating_script_path = os.path.expandvars(folder["updating_script"])
+        if not os.path.exists(updating_script_path):
+            errors.append(f"Update script not found: {updating_script_path}")
+        for key in ("min_interval", "max_interval", "backoff_factor"):
+            if key in folder and not (isinstance(folder[key], (int, float)) and folder[key] > 0):
+                errors.append(f"folders[{index}].{key} must be a positive number")
+    for group in ("file_group_a", "file_group_b"):
+        for pattern in config.get(group) or []:
+            try:
+                re.compile(pattern)
+            except (re.error, TypeError) as e:
+                errors.append(f"Invalid pattern in {group}: {pattern!r} ({e})")
+    change_detection = config.get("change_detection") or {}
+    if change_detection.get("mode", "mtime") not in MODES:
+        errors.append(f"change_detection.mode must be one of {', '.join(MODES)}")
+    for key in NUMERIC_SETTINGS:
+        if key in config and not (isinstance(config[key], (int, float)) and config[key] >= 0):
+            errors.append(f"{key} must be a non-negative number")
+    failure_backoff = config.get("failure_backoff") or {}
+    for key in ("base_delay", "max_delay", "max_consecutive_failures"):
+        if key in failure_backoff and not (isinstance(failure_backoff[key], (int, float)) and failure_backoff[key] >= 0):
+            errors.append(f"failure_backoff.{key} must be a non-negative number")
+    return errors
+
+
+class ConfigReloader:
+    def __init__(self, path):
+        self.path = path
+        self.signature = self._signature()
+        self.last_errors = []
+
+    def _signature(self):
+        try:
+            stat_result = os.stat(self.path)
+        except OSError:
+            return None
+        return stat_result.st_mtime, stat_result.st_size
+
+    def poll(self):
+        # 回傳 (新 config, 錯誤清單)；config 檔未變動時回傳 (None, [])
+        signature = self._signature()
+        if signature is None or signature == self.signature:
+            return None, []
+        self.signature = signature
+        try:
+            config = read_config_file(self.path)
+        except Exception as e:
+            self.last_errors = [f"Cannot load config: {e}"]
+            return None, self.last_errors
+        self.last_errors = validate_monitoring_config(config)
+        if self.last_errors:
+            return None, self.last_errors
+        return config, []
@@ -0,0 +1,138 @@
+import time
+
+# --- Excel Application session ---
+# 同一批更新共用一個 Excel Application：讀取 metadata、開檔、更新連結、儲存都用同一個 instance，
+# 只有出錯後或處理咗 max_workbooks 個 workbook 之後先重新啟動（避免 Excel 長時間運行後越來越慢 / 漏 memory）。
+# 後端提供同一組介面：
+#   start() -> application / quit(application)
+# application 需要有 Workbooks.Open(...)，workbook 需要有 Close(SaveChanges=...)（即 Excel COM object model）。
+# 用邊個後端由 create_backend() 按名稱決定：win32com（真正的 Excel）或 simulated（見 simulated_excel.py）。
+
+# Excel 常數（唔依賴 win32com 產生的 constants）
+XL_EXCEL_LINKS = 1
+XL_WINDOWS = 2
+
+AUTOMATION_BACKENDS = ("win32com", "simulated")
+
+
+class ExcelSessionError(Exception):
+    pass
+
+
+class Win32ExcelBackend:
+    name = "win32com"
+
+    def __init__(self, visible=False):
+        try:
+            import win32com.client
+        except ImportError:
+            raise ExcelSessionError("pywin32 (win32com) is not installed, "
+                                    "set automation_backend to 'simulated' to run without Excel")
+        self._client = win32com.client
+        self.visible = visible
+
+    def start(self):
+        # DispatchEx：每次都啟動獨立的 Excel process，唔會接管（或 Quit 咗）用戶自己開住的 Excel
+        application = self._client.DispatchEx("Excel.Application")
+        application.Visible = self.visible
+        application.DisplayAlerts = False
+        application.EnableEvents = False
+        application.AskToUpdateLinks = False
+        return application
+
+    def quit(self, application):
+        try:
+            application.EnableEvents = True
+        except Exception:
+            pass
+        application.Quit()
+
+
+def create_backend(name="win32com", visible=False, simulated_settings=None):
+    # simulated_settings: SimulatedExcelBackend 的參數（latencies、failure_rates、workbooks 等）
+    if name == "win32com":
+        return Win32ExcelBackend(visible=visible)
+    if name == "simulated":
+        from simulated_excel import SimulatedExcelBackend
+        return SimulatedExcelBackend(**(simulated_settings or {}))
+    raise ExcelSessionError(f"Unknown automation backend: {name} (expected one of {', '.join(AUTOMATION_BACKENDS)})")
+
+
+class ExcelSession:
+    def __init__(self, backend, max_workbooks=20, log=None):
+        self.backend = backend
+        self.max_workbooks = max_workbooks
+        self.log = log or (lambda message, level="info": None)
+        self.application = None
+        self.open_workbooks = []
+        self.workbooks_processed = 0  # 目前 application 已處理的 workbook 數目
+        self.starts = 0
+        self.needs_recycle = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_application(self):
+        if self.application is not None and self.needs_recycle:
+            self.recycle()
+        if self.application is None:
+            started_at = time.time()
+            try:
+                self.application = self.backend.start()
+            except Exception as e:
+                raise ExcelSessionError(f"Cannot start Excel application: {e}")
+            self.starts += 1
+            self.workbooks_processed = 0
+            self.needs_recycle = False
+            self.log(f"🚀 Excel application started via {self.backend.name} ({round(time.time() - started_at, 1)} seconds)")
+        return self.application
+
+    def open_workbook(self, file_path, **open_params):
+        workbook = self.get_application().Workbooks.Open(Filename=file_path, **open_params)
+        self.open_workbooks.append(workbook)
+        return workbook
+
+    def open_read_only(self, file_path, open_password=None, write_password=None):
+        # 只讀 metadata 用：唔更新連結、唔理 read-only recommended
+        open_params = {'ReadOnly': True, 'UpdateLinks': False, 'IgnoreReadOnlyRecommended': True}
+        if open_password:
+            open_params['Password'] = open_password
+        if write_password:
+            open_params['WriteResPassword'] = write_password
+        return self.open_workbook(file_path, **open_params)
+
+    def close_workbook(self, workbook, save_changes=False):
+        if workbook in self.open_workbooks:
+            self.open_workbooks.remove(workbook)
+        workbook.Close(SaveChanges=save_changes)
+
+    def finish_workbook(self, failed=False):
+        # 每處理完一個 workbook 呼叫一次；出錯或者達到 max_workbooks 即喺下次使用前重新啟動 Excel
+        self.workbooks_processed += 1
+        if failed:
+            self.needs_recycle = True
+        elif self.max_workbooks and self.workbooks_processed >= self.max_workbooks:
+            self.needs_recycle = True
+
+    def recycle(self):
+        if self.application is None:
+            return
+        for workbook in list(self.open_workbooks):
+            try:
+                self.close_workbook(workbook)
+            except Exception as e:
+                self.log(f"⚠️ Error occurred while closing workbook: {str(e)}", "warning")
+        self.open_workbooks = []
+        try:
+            self.backend.quit(self.application)
+            self.log(f"🔐 Excel application closed after {self.workbooks_processed} workbook(s)")
+        except Exception as e:
+            self.log(f"⚠️ Error occurred while closing Excel application: {str(e)}", "warning")
+        self.application = None
+        self.needs_recycle = False
+
+    def close(self):
+        self.recycle()
@@ -0,0 +1,114 @@
+import zlib
+import struct
+import hashlib
+import zipfile
+
+# --- 檔案內容指紋 ---
+# 先比較 size + mtime；只有兩者改變時先計內容指紋（每個檔案 cache 一份），
+# 指紋不變（例如只係開檔再儲存、或被同步工具 touch）就唔當係有變動。
+#   sampled: Office 檔（xlsx / xlsm 等 zip 格式）只讀尾部的 central directory，用每個 part 的 CRC 做指紋；
+#            其他檔案讀頭、中、尾三段加上 size
+#   full:    讀取整個檔案內容（zip 格式會解壓每個 part）
+# 兩種模式都會略過 docProps/*（儲存時間、最後修改者等），單純重新儲存唔會被當成內容改變。
+
+MODES = ("mtime", "sampled", "full")
+IGNORED_ZIP_PARTS = ("docProps/",)
+ZIP_SUFFIXES = (".xlsx", ".xlsm", ".xltx", ".xltm", ".xlam", ".docx", ".pptx", ".zip")
+
+
+def _is_ignored_part(name):
+    return name.startswith(IGNORED_ZIP_PARTS)
+
+
+def _zip_directory_fingerprint(file_path):
+    # 只讀 central directory（檔案尾部），唔使解壓任何內容
+    digest = hashlib.sha1()
+    with zipfile.ZipFile(file_path) as archive:
+        for info in sorted(archive.infolist(), key=lambda item: item.filename):
+            if _is_ignored_part(info.filename):
+                continue
+            digest.update(info.filename.encode("utf-8"))
+            digest.update(struct.pack("<IQ", info.CRC, info.file_size))
+    return digest.hexdigest()
+
+
+def _zip_content_fingerprint(file_path, chunk_size):
+    digest = hashlib.sha1()
+    with zipfile.ZipFile(file_path) as archive:
+        for info in sorted(archive.infolist(), key=lambda item: item.filename):
+            if _is_ignored_part(info.filename):
+                continue
+            digest.update(info.filename.encode("utf-8"))
+            with archive.open(info) as part:
+                for chunk in iter(lambda: part.read(chunk_size), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _sampled_fingerprint(file_path, size, sample_size):
+    digest = hashlib.sha1(str(size).encode("ascii"))
+    with open(file_path, "rb") as f:
+        if size <= sample_size * 3:
+            digest.update(f.read())
+        else:
+            for offset in (0, size // 2 - sample_size // 2, size - sample_size):
+                f.seek(offset)
+                digest.update(f.read(sample_size))
+    return digest.hexdigest()
+
+
+def _full_fingerprint(file_path, chunk_size):
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compute_fingerprint(file_path, size, mode="sampled", sample_size=64 * 1024):
+    if file_path.lower().endswith(ZIP_SUFFIXES):
+        try:
+            if mode == "full":
+                return _zip_content_fingerprint(file_path, sample_size)
+            return _zip_directory_fingerprint(file_path)
+        except (zipfile.BadZipFile, zlib.error, EOFError, RuntimeError, NotImplementedError):
+            # 加密或寫到一半的 Office 檔，當普通檔案處理
+            pass
+    if mode == "full":
+        return _full_fingerprint(file_path, sample_size)
+    return _sampled_fingerprint(file_path, size, sample_size)
+
+
+class FingerprintCache:
+    def __init__(self, mode="sampled", sample_size=64 * 1024):
+        if mode not in MODES:
+            raise ValueError(f"Unknown change detection mode: {mode}")
+        self.mode = mode
+        self.sample_size = sample_size
+        self._cache = {}  # file_path -> (mtime, size, fingerprint)
+        self.hash_calls = 0
+
+    def fingerprint(self, file_path, mtime, size):
+        cached = self._cache.get(file_path)
+        if cached is not None and cached[0] == mtime and cached[1] == size:
+            return cached[2]
+        try:
+            fingerprint = compute_fingerprint(file_path, size, self.mode, self.sample_size)
+        except OSError:
+            # 讀唔到（例如被 Excel 鎖住）：當作有改變，下次再試
+            self._cache.pop(file_path, None)
+            return None
+        self.hash_calls += 1
+        self._cache[file_path] = (mtime, size, fingerprint)
+        return fingerprint
+
+    def seed(self, file_path, mtime, size, fingerprint):
+        # 由持久化狀態還原
+        self._cache[file_path] = (mtime, size, fingerprint)
+
+    def previous(self, file_path):
+        cached = self._cache.get(file_path)
+        return cached[2] if cached is not None else None
+
+    def forget(self, file_path):
+        self._cache.pop(file_path, None)
@@ -0,0 +1,171 @@
+import os
+import time
+
+# --- 每個資料夾的觸發狀態 ---
+# idle → pending → cooling → running → done → idle
+#   idle:    等待 Group A >= Group B
+#   pending: 條件成立，下一個 tick 開始冷卻
+#   cooling: 冷卻中，只重新檢查正在等待的 Group A 檔案
+#   running: 更新工作已交給 executor（排隊或執行中），期間仍會掃描，新的 Group A 變動會合併成 follow-up run
+#   done:    更新完成，下一個 tick 重新掃描並返回 idle
+IDLE = "idle"
+PENDING = "pending"
+COOLING = "cooling"
+RUNNING = "running"
+DONE = "done"
+
+
+class PollSchedule:
+    # 自適應 polling 間隔：有變動即回到 min_interval，否則每次乘以 backoff_factor，最多 max_interval
+    def __init__(self, min_interval, max_interval, backoff_factor=2.0):
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.backoff_factor = max(backoff_factor, 1.0)
+        self.interval = min_interval
+        self.next_due = time.monotonic()
+
+    def is_due(self, now=None):
+        return (now if now is not None else time.monotonic()) >= self.next_due
+
+    def due_in(self, now=None):
+        return max(self.next_due - (now if now is not None else time.monotonic()), 0)
+
+    def record(self, changed, now=None):
+        if changed:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff_factor, self.max_interval)
+        self.next_due = (now if now is not None else time.monotonic()) + self.interval
+
+    def postpone(self, now=None):
+        # 冷卻中唔使掃描，間隔不變，只延後下次到期時間
+        self.next_due = (now if now is not None else time.monotonic()) + self.interval
+
+    def retune(self, min_interval, max_interval, backoff_factor=2.0, now=None):
+        # config 熱重載：沿用目前間隔，但要落喺新的範圍內
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.backoff_factor = max(backoff_factor, 1.0)
+        self.interval = min(max(self.interval, self.min_interval), self.max_interval)
+        self.next_due = min(self.next_due, (now if now is not None else time.monotonic()) + self.interval)
+
+
+class FailureBackoff:
+    # 更新失敗後的重試間隔：每次連續失敗加倍（base_delay → max_delay）；
+    # 連續失敗 max_failures 次即暫停此資料夾（parked），直至 Group A 檔案再有變動先再試
+    def __init__(self, base_delay=60, max_delay=3600, max_failures=5):
+        self.base_delay = base_delay
+        self.max_delay = max(max_delay, base_delay)
+        self.max_failures = max_failures
+        self.consecutive_failures = 0
+        self.failed_generation = None
+        self.parked_reason = None
+        self.retry_at = None
+
+    def retune(self, base_delay, max_delay, max_failures):
+        self.base_delay = base_delay
+        self.max_delay = max(max_delay, base_delay)
+        self.max_failures = max_failures
+
+    def record_failure(self, generation, error, now=None):
+        # 回傳下次重試前要等的秒數（parked 則回傳 None）
+        self.consecutive_failures += 1
+        self.failed_generation = max(self.failed_generation or 0, generation or 0)
+        if self.max_failures and self.consecutive_failures >= self.max_failures:
+            self.parked_reason = f"{self.consecutive_failures} consecutive failures, last error: {error or 'update script returned a failure'}"
+            self.retry_at = None
+            return None
+        delay = min(self.base_delay * 2 ** (self.consecutive_failures - 1), self.max_delay)
+        self.retry_at = (now if now is not None else time.monotonic()) + delay
+        return delay
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.failed_generation = None
+        self.parked_reason = None
+        self.retry_at = None
+
+    def inputs_changed(self, group_a_newest):
+        # 失敗之後 Group A 再有變動（例如已修正來源檔），即時再試一次；失敗次數保留，再失敗會即刻再暫停
+        return self.consecutive_failures > 0 and group_a_newest > (self.failed_generation or 0)
+
+    def allow_retry(self):
+        self.parked_reason = None
+        self.retry_at = None
+
+    def retry_in(self, now=None):
+        if self.retry_at is None:
+            return 0
+        return max(self.retry_at - (now if now is not None else time.monotonic()), 0)
+
+    def take_due_retry(self, now=None):
+        # 等待時間已過：回傳 True 一次，由監控 loop 重新掃描此資料夾
+        if self.retry_at is None or self.retry_in(now) > 0:
+            return False
+        self.retry_at = None
+        return True
+
+
+class FolderState:
+    def __init__(self, folder_path, updating_script_path, scanner=None, schedule=None, failures=None):
+        self.folder_path = folder_path
+        self.updating_script_path = updating_script_path
+        self.scanner = scanner
+        self.schedule = schedule
+        self.failures = failures or FailureBackoff()
+        self.phase = IDLE
+        self.phase_since = time.time()
+        self.waiting_group_a = {}
+        self.cooldown_start = None
+        self.cooldown_entered_at = None
+        self.last_restat_calls = 0
+        self.trigger_generation = None
+        self.processed_generation = None
+        self.last_result = None
+
+    def transition(self, phase):
+        self.phase = phase
+        self.phase_since = time.time()
+
+    def is_scannable(self):
+        return self.phase in (IDLE, RUNNING, DONE)
+
+    def is_new_generation(self, group_a_newest):
+        handled = self.processed_generation
+        if self.phase == RUNNING and self.trigger_generation is not None:
+            # 執行中的更新已經涵蓋呢個 generation
+            handled = max(handled or 0, self.trigger_generation)
+        return handled is None or group_a_newest > handled
+
+    def mark_pending(self, group_a_last_times, group_a_newest):
+        self.waiting_group_a = dict(group_a_last_times)
+        self.trigger_generation = group_a_newest
+        self.transition(PENDING)
+
+    def start_cooldown(self):
+        self.cooldown_start = time.time()
+        self.cooldown_entered_at = self.cooldown_start
+        self.transition(COOLING)
+
+    def cooldown_remaining(self, cooldown_period):
+        return cooldown_period - (time.time() - self.cooldown_start)
+
+    def restat_group_a(self):
+        # 只 stat 冷卻中等待的 Group A 檔案，回傳第一個被更新的檔名（無則回傳 None）
+        self.last_restat_calls = 0
+        for file_name, last_time in self.waiting_group_a.items():
+            self.last_restat_calls += 1
+            try:
+                stat_result = os.stat(os.path.join(self.folder_path, file_name))
+            except OSError:
+                continue
+            new_time = stat_result.st_mtime
+            if new_time > last_time and self.scanner is not None and self.scanner.fingerprints is not None:
+                # waiting_group_a 係指紋調整後的時間，內容冇變（只係 touch）就唔當作更新
+                new_time = self.scanner._effective_time(file_name, new_time, stat_result.st_size)
+            if new_time > last_time:
+                self.waiting_group_a[file_name] = new_time
+                self.trigger_generation = max(self.trigger_generation or 0, new_time)
+                self.cooldown_start = time.time()
+                return file_name
+        return None
@@ -0,0 +1,271 @@
+import os
+import json
+import time
+import socket
+import hashlib
+import uuid
+
+# --- 多部機監控協調 ---
+# 所有 instance 共用 share 上的一個 lease 資料夾（唔使額外 service）：
+#   instances/<instance_id>.json  每個 instance 的 heartbeat，過期即視為已停止
+#   leases/<folder hash>.lease     每個監控資料夾的 lease，同一時間只有一個 instance 持有
+# 資料夾以 rendezvous hashing 分配俾仍然在線的 instance；instance 停止後其 lease 到期，由其他 instance 接手。
+# lease 入面亦記錄最後成功處理的 Group A generation，接手的 instance 唔會重複執行已完成的更新。
+# 主動交出的 lease 會標記 released，原本的持有者之後同其他 instance 一樣要等 grace 先可以再取得。
+# 同一 instance_id 重新啟動（同一部機、舊 process 已結束）時，分配俾自己的資料夾毋須等舊 lease 到期。
+# 注意：過期判斷用各機器的系統時間，所有機器需要同步時間（NTP）。
+
+
+def _write_json_atomic(path, data):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def process_alive(pid):
+    # 只用嚟判斷同一部機上的 process 仍否存在（Windows 上 os.kill 會終止 process，所以改用 OpenProcess）
+    if not pid:
+        return False
+    if os.name == "nt":
+        import ctypes
+        handle = ctypes.windll.kernel32.OpenProcess(0x100000, False, int(pid))  # SYNCHRONIZE
+        if not handle:
+            return False
+        try:
+            return ctypes.windll.kernel32.WaitForSingleObject(handle, 0) == 0x102  # WAIT_TIMEOUT
+        finally:
+            ctypes.windll.kernel32.CloseHandle(handle)
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+def rendezvous_owner(folder_path, instance_ids):
+    # 每個 (instance, 資料夾) 計一個分數，分數最高的 instance 負責該資料夾；
+    # 有 instance 加入或離開時，只有少部分資料夾需要轉手
+    def score(instance_id):
+        return hashlib.sha1(f"{instance_id}|{folder_path}".encode("utf-8")).digest()
+
+    return max(instance_ids, key=score) if instance_ids else None
+
+
+class LeaseCoordinator:
+    def __init__(self, lease_directory, instance_id=None, ttl=60):
+        self.lease_directory = lease_directory
+        self.instance_id = instance_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.ttl = ttl
+        self.renew_interval = max(ttl / 3.0, 1)
+        self.owned = {}  # folder_path -> lease token
+        self.generations = {}  # folder_path -> 最後成功處理的 generation
+        self.last_sync = 0
+        self.instances_dir = os.path.join(lease_directory, "instances")
+        self.leases_dir = os.path.join(lease_directory, "leases")
+        os.makedirs(self.instances_dir, exist_ok=True)
+        os.makedirs(self.leases_dir, exist_ok=True)
+
+    # --- heartbeat ---
+    def heartbeat(self):
+        os.makedirs(self.instances_dir, exist_ok=True)
+        os.makedirs(self.leases_dir, exist_ok=True)
+        _write_json_atomic(os.path.join(self.instances_dir, f"{self.instance_id}.json"), {
+            "instance_id": self.instance_id,
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "expires_at": time.time() + self.ttl,
+        })
+
+    def live_instances(self):
+        now = time.time()
+        instance_ids = {self.instance_id}
+        for entry in os.scandir(self.instances_dir):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                with open(entry.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if data.get("expires_at", 0) > now:
+                instance_ids.add(data.get("instance_id", entry.name[:-5]))
+            elif data.get("expires_at", 0) < now - self.ttl * 10:
+                # 早已停止的 instance，順手清理
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+        return sorted(instance_ids)
+
+    # --- lease ---
+    def _lease_path(self, folder_path):
+        digest = hashlib.sha1(folder_path.encode("utf-8")).hexdigest()[:20]
+        return os.path.join(self.leases_dir, f"{digest}.lease")
+
+    def _read_lease(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            # 其他 instance 啱啱建立、未寫完的 lease，當係有效
+            try:
+                return {"owner": None, "token": None, "expires_at": os.path.getmtime(path) + self.ttl}
+            except OSError:
+                return None
+
+    def _lease_data(self, folder_path, token, expires_at, released=False):
+        return {
+            "folder_path": folder_path,
+            "owner": self.instance_id,
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "token": token,
+            "expires_at": expires_at,
+            "released": released,
+            "processed_generation": self.generations.get(folder_path),
+        }
+
+    def _restarted(self, previous):
+        # 同一 instance_id、同一部機、舊 process 已經唔存在，先當係重新啟動
+        return (previous.get("owner") == self.instance_id
+                and not previous.get("released")
+                and previous.get("host") == socket.gethostname()
+                and previous.get("pid") != os.getpid()
+                and not process_alive(previous.get("pid")))
+
+    def try_acquire(self, folder_path, grace=0, assigned=False):
+        # 成功回傳 lease 內容（連同上一個持有者記錄的 processed_generation），否則回傳 None。
+        # grace: lease 過期後要再等幾耐先接手；assigned: 資料夾係咪分配俾本 instance
+        path = self._lease_path(folder_path)
+        token = uuid.uuid4().hex
+        previous = self._read_lease(path)
+        if previous is not None:
+            if previous.get("owner") == self.instance_id and previous.get("token") == self.owned.get(folder_path):
+                return previous if self.renew(folder_path) else None
+            restarted = assigned and self._restarted(previous)
+            if not restarted and previous.get("expires_at", 0) + grace > time.time():
+                return None
+            # 過期（或已釋放）的 lease：先改名移走，再用 O_EXCL 重新建立；同時有幾個 instance 爭，只有一個成功
+            stale_path = f"{path}.{token}.stale"
+            try:
+                os.rename(path, stale_path)
+            except OSError:
+                return None
+            moved = self._read_lease(stale_path)
+            if moved is not None and moved.get("token") != previous.get("token"):
+                # 移走咗其他 instance 啱啱建立的新 lease，放返原位
+                try:
+                    os.rename(stale_path, path)
+                except OSError:
+                    pass
+                return None
+            try:
+                os.remove(stale_path)
+            except OSError:
+                pass
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return None
+        if previous is not None and previous.get("processed_generation") is not None:
+            self.generations[folder_path] = max(
+                self.generations.get(folder_path) or 0, previous["processed_generation"]
+            )
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self._lease_data(folder_path, token, time.time() + self.ttl), f)
+        self.owned[folder_path] = token
+        return previous or {}
+
+    def renew(self, folder_path):
+        token = self.owned.get(folder_path)
+        if token is None:
+            return False
+        path = self._lease_path(folder_path)
+        current = self._read_lease(path)
+        if current is None or current.get("token") != token:
+            # lease 已被其他 instance 接手（例如本機停頓超過 TTL）
+            self.owned.pop(folder_path, None)
+            return False
+        try:
+            _write_json_atomic(path, self._lease_data(folder_path, token, time.time() + self.ttl))
+        except OSError:
+            # share 暫時唔能寫入：今次當續期失敗，lease 未過期前仍然保留
+            return False
+        return True
+
+    def release(self, folder_path):
+        # 唔刪除 lease 檔，只將到期時間設為而家並標記 released，保留 processed_generation 俾下一個持有者
+        token = self.owned.pop(folder_path, None)
+        if token is None:
+            return
+        path = self._lease_path(folder_path)
+        current = self._read_lease(path)
+        if current is not None and current.get("token") == token:
+            try:
+                _write_json_atomic(path, self._lease_data(folder_path, token, time.time(), released=True))
+            except OSError:
+                pass
+
+    def record_generation(self, folder_path, generation):
+        if generation is None:
+            return
+        self.generations[folder_path] = max(self.generations.get(folder_path) or 0, generation)
+        if folder_path in self.owned:
+            self.renew(folder_path)
+
+    def owns(self, folder_path):
+        return folder_path in self.owned
+
+    # --- 分配 ---
+    def sync_due(self):
+        return time.time() - self.last_sync >= self.renew_interval
+
+    def sync(self, folder_paths, can_release=None):
+        # 更新 heartbeat、續期 / 取得 / 釋放 lease。回傳 (gained, lost)：
+        #   gained: {folder_path: 上一個持有者的 lease 內容}
+        #   lost:   失去 lease 的資料夾
+        self.last_sync = time.time()
+        gained, lost = {}, []
+        try:
+            self.heartbeat()
+            instance_ids = self.live_instances()
+        except OSError:
+            # share 暫時唔能存取：保留現有 lease（未過期前仍然有效），下次再試
+            for folder_path in list(self.owned):
+                if not self.renew(folder_path) and folder_path not in self.owned:
+                    lost.append(folder_path)
+            return gained, lost
+        folder_paths = set(folder_paths)
+        for folder_path in [path for path in self.owned if path not in folder_paths]:
+            self.release(folder_path)
+        for folder_path in sorted(folder_paths):
+            assigned = rendezvous_owner(folder_path, instance_ids) == self.instance_id
+            if folder_path in self.owned:
+                if not assigned and (can_release is None or can_release(folder_path)):
+                    # 資料夾已分配俾其他 instance，閒置時交出
+                    self.release(folder_path)
+                    lost.append(folder_path)
+                elif not self.renew(folder_path):
+                    lost.append(folder_path)
+                continue
+            # 分配俾自己的資料夾即時嘗試取得；其他資料夾只在 lease 過期超過一個 TTL（冇人接手）時先接手
+            try:
+                previous = self.try_acquire(folder_path, grace=0 if assigned else self.ttl, assigned=assigned)
+            except OSError:
+                continue
+            if previous is not None:
+                gained[folder_path] = previous
+        return gained, lost
+
+    def close(self):
+        for folder_path in list(self.owned):
+            self.release(folder_path)
+        try:
+            os.remove(os.path.join(self.instances_dir, f"{self.instance_id}.json"))
+        except OSError:
+            pass
@@ -0,0 +1,190 @@
+import os
+import re
+import zipfile
+import threading
+from urllib.parse import unquote
+from xml.etree import ElementTree
+
+# --- Workbook 之間的連結關係 ---
+# xlsx / xlsm 的外部連結記錄喺 xl/externalLinks/_rels/externalLinkN.xml.rels 的 Target，
+# 直接讀 zip 就知道每個 workbook 連結去邊啲來源檔，唔使開 Excel。結果按 (path, size, mtime) cache。
+# 之後按連結關係排成先後次序的 wave：來源檔先更新，互不相關的 workbook 可以同一個 wave 並行處理。
+
+EXTERNAL_LINK_RELS = re.compile(r"^xl/externalLinks/_rels/externalLink\d+\.xml\.rels$")
+RELATIONSHIPS_NAMESPACE = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+
+def normalize_path(file_path):
+    return os.path.normcase(os.path.normpath(os.path.abspath(file_path)))
+
+
+def resolve_link_target(target, workbook_path):
+    # Target 可能係 "file:///K:\Chain\Data%20-%20All.xlsx"、"/K:/Chain/x.xlsx"、UNC 或相對路徑
+    target = unquote(target.strip())
+    lowered = target.lower()
+    if lowered.startswith("file:///"):
+        target = target[7:]
+    elif lowered.startswith("file://"):
+        target = "\\\\" + target[7:]
+    if re.match(r"^/[A-Za-z]:", target):
+        target = target[1:]
+    if re.match(r"^[A-Za-z]:", target) or target.startswith(("\\\\", "//")):
+        return target.replace("/", "\\") if os.name == "nt" else target
+    if not os.path.isabs(target):
+        target = os.path.join(os.path.dirname(workbook_path), target)
+    return target
+
+
+def read_external_links(file_path):
+    # 回傳連結去的來源檔路徑；唔係 zip（例如加密檔案）回傳 None
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            links = []
+            for name in archive.namelist():
+                if not EXTERNAL_LINK_RELS.match(name):
+                    continue
+                root = ElementTree.fromstring(archive.read(name))
+                for relationship in root.iter(f"{{{RELATIONSHIPS_NAMESPACE}}}Relationship"):
+                    target = relationship.get("Target")
+                    if target and relationship.get("TargetMode") == "External":
+                        links.append(resolve_link_target(target, file_path))
+            return links
+    except zipfile.BadZipFile:
+        return None
+
+
+class LinkCache:
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._cache = {}  # file_path -> (size, mtime, links)
+        self.hits = 0
+        self.reads = 0
+
+    def links(self, file_path):
+        try:
+            stat_result = os.stat(file_path)
+        except OSError:
+            return None
+        key = (stat_result.st_size, stat_result.st_mtime)
+        with self._lock:
+            cached = self._cache.get(file_path)
+            if cached is not None and cached[:2] == key:
+                self.hits += 1
+                return cached[2]
+        try:
+            links = read_external_links(file_path)
+        except (OSError, ElementTree.ParseError, NotImplementedError, RuntimeError):
+            links = None
+        with self._lock:
+            self.reads += 1
+            if len(self._cache) >= self.max_entries:
+                self._cache.clear()
+            self._cache[file_path] = key + (links,)
+        return links
+
+
+_link_cache = LinkCache()
+
+
+def workbook_links(file_path):
+    return _link_cache.links(file_path)
+
+
+def strongly_connected_components(nodes, dependencies):
+    # Tarjan's algorithm（非遞迴版本），回傳 [[node, ...], ...]，每組內按 nodes 次序
+    order = {node: position for position, node in enumerate(nodes)}
+    index = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    components = []
+
+    def visit(node):
+        index[node] = lowlink[node] = len(index)
+        stack.append(node)
+        on_stack.add(node)
+        successors = sorted((dependency for dependency in dependencies.get(node, ()) if dependency in order), key=order.get)
+        work.append((node, iter(successors)))
+
+    for root in nodes:
+        if root in index:
+            continue
+        work = []
+        visit(root)
+        while work:
+            node, successors = work[-1]
+            for successor in successors:
+                if successor not in index:
+                    visit(successor)
+                    break
+                if successor in on_stack:
+                    lowlink[node] = min(lowlink[node], index[successor])
+            else:
+                work.pop()
+                if work:
+                    lowlink[work[-1][0]] = min(lowlink[work[-1][0]], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(sorted(component, key=order.get))
+    return components
+
+
+def topological_waves(nodes, dependencies):
+    # nodes: 按 config 次序的節點；dependencies: {node: 要先處理的節點}
+    # 回傳 (waves, cyclic)：循環依賴的節點（strongly connected component）成組按原本次序逐個處理，
+    # 下游的節點等成組處理完先排；cyclic 只包括真正喺循環入面的節點
+    nodes = list(nodes)
+    order = {node: position for position, node in enumerate(nodes)}
+    components = strongly_connected_components(nodes, dependencies)
+    component_of = {node: number for number, component in enumerate(components) for node in component}
+    requires = {
+        number: {component_of[dependency] for node in component for dependency in dependencies.get(node, ())
+                 if dependency in component_of} - {number}
+        for number, component in enumerate(components)
+    }
+    cycles = {number for number, component in enumerate(components)
+              if len(component) > 1 or component[0] in dependencies.get(component[0], ())}
+    remaining = sorted(range(len(components)), key=lambda number: order[components[number][0]])
+    done = set()
+    waves = []
+    while remaining:
+        ready = [number for number in remaining if requires[number] <= done]
+        wave = [components[number][0] for number in ready if number not in cycles]
+        if wave:
+            waves.append(wave)
+        for number in ready:
+            if number in cycles:
+                waves.extend([node] for node in components[number])
+        done.update(ready)
+        remaining = [number for number in remaining if number not in done]
+    cyclic = sorted((node for number in cycles for node in components[number]), key=order.get)
+    return waves, cyclic
+
+
+def build_refresh_waves(jobs, file_configs, base_directory):
+    # jobs: [(filename, prefix)]，按 config 次序。依賴來自兩方面：
+    #   1. workbook 的外部連結指向同一批另一個 workbook
+    #   2. file_configs 的 depends_on（加密檔案讀唔到連結時可以手動指定）
+    # 回傳 (waves, cyclic, links)：waves / cyclic 係 jobs 的 index；links = {index: [來源 index]}
+    indexes_by_path = {}
+    for index, (filename, _prefix) in enumerate(jobs):
+        indexes_by_path.setdefault(normalize_path(os.path.join(base_directory, filename)), []).append(index)
+    dependencies = {}
+    links = {}
+    for index, (filename, prefix) in enumerate(jobs):
+        sources = set()
+        for link_path in workbook_links(os.path.join(base_directory, filename)) or []:
+            sources.update(indexes_by_path.get(normalize_path(link_path), ()))
+        links[index] = sorted(source for source in sources if jobs[source][0] != filename)
+        depends_on = (file_configs.get(prefix) or {}).get("depends_on") or []
+        sources.update(source for source, (_, source_prefix) in enumerate(jobs) if source_prefix in depends_on)
+        dependencies[index] = {source for source in sources if jobs[source][0] != filename}
+    waves, cyclic = topological_waves(range(len(jobs)), dependencies)
+    return waves, cyclic, links
@@ -0,0 +1,234 @@
+import os
+import sys
+import time
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+# --- 共用 logging pipeline ---
+# monitoring.py 及 updating.py 共用。訊息先放入 queue，由背景 thread 負責格式化及寫入 console / log 檔，
+# 監控 loop 唔使等 console I/O。支援 level、quiet mode（只顯示狀態轉變）及重複訊息限流。
+
+STATUS = 15    # 每輪掃描結果、冷卻倒數等狀態訊息
+ACTION = 25    # 狀態轉變：進入冷卻、觸發更新等
+SUCCESS = 26
+logging.addLevelName(STATUS, "STATUS")
+logging.addLevelName(ACTION, "ACTION")
+logging.addLevelName(SUCCESS, "SUCCESS")
+
+MESSAGE_LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "STATUS": STATUS,
+    "INFO": logging.INFO,
+    "ACTION": ACTION,
+    "SUCCESS": SUCCESS,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR,
+}
+
+SYMBOLS = {
+    "INFO": "ℹ",
+    "ACTION": "➤",
+    "WARNING": "⚠️",
+    "ERROR": "❌",
+    "SUCCESS": "🎉"
+}
+
+ROOT_LOGGER_NAME = "automation"
+
+
+def level_from_name(name, default=STATUS):
+    if isinstance(name, int):
+        return name
+    return MESSAGE_LEVELS.get(str(name).upper(), default)
+
+
+class RateLimitFilter(logging.Filter):
+    # 同一 logger、同一 level、完全相同的訊息，interval 秒內只輸出一次；被略過的次數會附加喺下一次輸出。
+    # 狀態轉變（ACTION / SUCCESS）唔限流。
+    def __init__(self, interval=0, max_keys=2048):
+        super().__init__()
+        self.interval = interval
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._seen = {}  # (name, levelno, msg) -> [last_emitted, suppressed]
+
+    def filter(self, record):
+        if not self.interval or record.levelno in (ACTION, SUCCESS):
+            return True
+        key = (record.name, record.levelno, record.msg)
+        now = record.created
+        with self._lock:
+            seen = self._seen.get(key)
+            if seen is not None and now - seen[0] < self.interval:
+                seen[1] += 1
+                return False
+            if seen is not None and seen[1]:
+                record.repeated = seen[1]
+            if seen is None and len(self._seen) >= self.max_keys:
+                self._prune(now)
+            self._seen[key] = [now, 0]
+        return True
+
+    def _prune(self, now):
+        expired = [key for key, (emitted, _) in self._seen.items() if now - emitted >= self.interval]
+        for key in expired:
+            del self._seen[key]
+        if len(self._seen) >= self.max_keys:
+            self._seen.clear()
+
+
+class PipelineFormatter(logging.Formatter):
+    # console：
+    #   tagged       "ℹ [INFO] 2024-01-01 12:00:00: 訊息"（monitoring 的 print_message）
+    #   timestamped  "[2024-01-01 12:00:00] 訊息"（updating 的 console_print）
+    #   plain        只有訊息（狀態區塊）
+    # log 檔：       "2024-01-01 12:00:00 | INFO     | 訊息"
+    def __init__(self, file_style=False):
+        super().__init__()
+        self.file_style = file_style
+        self._cached_second = None
+        self._cached_time = ""
+
+    def formatTime(self, record, datefmt=None):
+        # 同一秒內的訊息重用已格式化的時間
+        second = int(record.created)
+        if second != self._cached_second:
+            self._cached_second = second
+            self._cached_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+        return self._cached_time
+
+    def format(self, record):
+        message = record.getMessage()
+        repeated = getattr(record, "repeated", 0)
+        if repeated:
+            message = f"{message} (repeated {repeated} more times)"
+        timestamp = self.formatTime(record)
+        if self.file_style:
+            return f"{timestamp} | {record.levelname:<8} | {message}"
+        style = getattr(record, "log_style", "tagged")
+        if style == "plain":
+            return message
+        if style == "timestamped":
+            return f"[{timestamp}] {message}"
+        message_type = getattr(record, "message_type", record.levelname)
+        return f"{SYMBOLS.get(message_type, 'ℹ')} [{message_type}] {timestamp}: {message}"
+
+
+class LogPipeline:
+    def __init__(self, stream=None):
+        self.pid = os.getpid()
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+        self.queue = queue.Queue(-1)
+        self.rate_limiter = RateLimitFilter()
+        self.queue_handler = QueueHandler(self.queue)
+        self.queue_handler.addFilter(self.rate_limiter)
+        self.logger = logging.getLogger(ROOT_LOGGER_NAME)
+        self.logger.addHandler(self.queue_handler)
+        self.logger.propagate = False
+        if self.logger.level == logging.NOTSET:
+            self.logger.setLevel(STATUS)
+        self.log_files = {}  # logger name -> FileHandler
+        self.listener = None
+        self._restart()
+
+    def _restart(self):
+        # QueueListener.stop() 會先處理完 queue 內所有訊息
+        if self.listener is not None:
+            self.listener.stop()
+        console_handler = logging.StreamHandler(self.stream)
+        console_handler.setFormatter(PipelineFormatter())
+        self.listener = QueueListener(self.queue, console_handler, *self.log_files.values(), respect_handler_level=True)
+        self.listener.start()
+
+    def configure(self, level=STATUS, quiet=False, rate_limit_seconds=0, log_file=None):
+        # quiet mode：只保留狀態轉變（ACTION / SUCCESS）、警告及錯誤
+        self.logger.setLevel(ACTION if quiet else level_from_name(level))
+        self.rate_limiter.interval = rate_limit_seconds or 0
+        self.set_log_file(ROOT_LOGGER_NAME, log_file)
+
+    def set_log_file(self, logger_name, path):
+        # 某個 logger（連同其子 logger）的訊息另外寫入 log 檔；path 為 None 即停止寫入
+        with self._lock:
+            old_handler = self.log_files.pop(logger_name, None)
+            if path:
+                file_handler = logging.FileHandler(path, encoding="utf-8")
+                file_handler.setFormatter(PipelineFormatter(file_style=True))
+                file_handler.addFilter(logging.Filter(logger_name))
+                self.log_files[logger_name] = file_handler
+            elif old_handler is None:
+                return
+            self._restart()
+            if old_handler is not None:
+                old_handler.close()
+
+    def flush(self):
+        # 等 queue 內所有訊息寫入（例如寄出 log 檔之前）
+        if self.listener is not None:
+            self.queue.join()
+
+    def detach(self):
+        self.logger.removeHandler(self.queue_handler)
+
+    def stop(self):
+        with self._lock:
+            if self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+            for file_handler in self.log_files.values():
+                file_handler.close()
+            self.log_files.clear()
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline():
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = LogPipeline()
+                atexit.register(_pipeline.stop)
+    return _pipeline
+
+
+def _reset_after_fork():
+    # fork 出嚟的 worker process 冇 listener thread，下次寫 log 時重新建立 pipeline
+    global _pipeline, _pipeline_lock
+    _pipeline_lock = threading.Lock()
+    if _pipeline is not None:
+        _pipeline.detach()
+        _pipeline = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_logger(name):
+    get_pipeline()
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}")
+
+
+def configure_logging(level=STATUS, quiet=False, rate_limit_seconds=0, log_file=None):
+    get_pipeline().configure(level, quiet, rate_limit_seconds, log_file)
+
+
+def set_log_file(name, path):
+    get_pipeline().set_log_file(f"{ROOT_LOGGER_NAME}.{name}", path)
+
+
+def flush_logging():
+    get_pipeline().flush()
+
+
+def log_message(logger, message, message_type="INFO", style="tagged"):
+    get_pipeline()
+    level = MESSAGE_LEVELS.get(message_type, logging.INFO)
+    if logger.isEnabledFor(level):
+        logger.log(level, message, extra={"message_type": message_type, "log_style": style})
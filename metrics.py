@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- 運行指標 ---
+# 記錄 counter / gauge / summary（次數、總和、最大值），
+# 可輸出成 Prometheus text format 檔案、JSON 檔案，或經本機 HTTP endpoint 提供。
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels) + "}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._types = {}
+        self._counters = {}
+        self._gauges = {}
+        self._summaries = {}  # key -> [count, sum, max]
+        self.started_at = time.time()
+
+    def describe(self, name, metric_type, help_text):
+        self._types[name] = metric_type
+        self._help[name] = help_text
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            summary = self._summaries.setdefault(key, [0, 0.0, value])
+            summary[0] += 1
+            summary[1] += value
+            summary[2] = max(summary[2], value)
+
+    def to_prometheus(self):
+        families = {}  # name -> (type, [(sample_name, labels, value)])
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                families.setdefault(name, (self._types.get(name, "counter"), []))[1].append((name, labels, value))
+            for (name, labels), value in self._gauges.items():
+                families.setdefault(name, (self._types.get(name, "gauge"), []))[1].append((name, labels, value))
+            for (name, labels), (count, total, maximum) in self._summaries.items():
+                samples = families.setdefault(name, ("summary", []))[1]
+                samples.append((f"{name}_count", labels, count))
+                samples.append((f"{name}_sum", labels, total))
+                families.setdefault(f"{name}_max", ("gauge", []))[1].append((f"{name}_max", labels, maximum))
+        lines = []
+        for name in sorted(families):
+            metric_type, samples = families[name]
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        def rows(items, make_value):
+            return [dict(labels, name=name, **make_value(value)) for (name, labels), value in items]
+
+        with self._lock:
+            return {
+                "generated_at": time.time(),
+                "started_at": self.started_at,
+                "counters": rows(self._counters.items(), lambda v: {"value": v}),
+                "gauges": rows(self._gauges.items(), lambda v: {"value": v}),
+                "summaries": rows(
+                    self._summaries.items(),
+                    lambda v: {"count": v[0], "sum": v[1], "max": v[2], "avg": v[1] / v[0] if v[0] else 0}
+                ),
+            }
+
+    def write_files(self, prometheus_path=None, json_path=None):
+        if prometheus_path:
+            self._write_atomic(prometheus_path, self.to_prometheus())
+        if json_path:
+            self._write_atomic(json_path, json.dumps(self.to_dict(), ensure_ascii=False, indent=2))
+
+    @staticmethod
+    def _write_atomic(path, text):
+        # 先寫暫存檔再 replace，避免讀取方讀到寫了一半的檔案
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def start_http_server(self, port, host="127.0.0.1"):
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics.json"):
+                    body = json.dumps(registry.to_dict(), ensure_ascii=False).encode("utf-8")
+                    content_type = "application/json; charset=utf-8"
+                elif self.path.startswith("/metrics"):
+                    body = registry.to_prometheus().encode("utf-8")
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+        thread.start()
+        return server
+
+
+def create_monitoring_metrics():
+    registry = MetricsRegistry()
+    registry.describe("monitor_iterations_total", "counter", "Number of scan iterations")
+    registry.describe("monitor_scan_duration_seconds", "summary", "Time spent scanning one folder")
+    registry.describe("monitor_stat_calls_total", "counter", "File stat calls made while scanning or cooling down")
+    registry.describe("monitor_content_unchanged_total", "counter", "Modified Group A files whose content fingerprint did not change")
+    registry.describe("monitor_scan_errors_total", "counter", "Folder scans that failed or found the folder missing")
+    registry.describe("monitor_cooldown_duration_seconds", "summary", "Time from entering cooldown to triggering the update")
+    registry.describe("monitor_trigger_to_start_seconds", "summary", "Time from triggering an update to the worker starting it")
+    registry.describe("monitor_trigger_to_finish_seconds", "summary", "Time from triggering an update to it finishing")
+    registry.describe("monitor_updates_total", "counter", "Finished update runs by result")
+    registry.describe("monitor_folder_phase", "gauge", "Current trigger phase of each folder (1 = active phase)")
+    registry.describe("monitor_poll_interval_seconds", "gauge", "Current adaptive polling interval of each folder")
+    registry.describe("monitor_consecutive_failures", "gauge", "Consecutive failed update runs of each folder")
+    registry.describe("monitor_folder_parked", "gauge", "Folders paused after too many consecutive failures (1 = parked)")
+    registry.describe("monitor_owned_folders", "gauge", "Folders whose lease is held by this instance")
+    return registry
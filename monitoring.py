@@ -1,12 +1,23 @@
 import os
-import re
 from datetime import datetime
 import time
 import sys
-import importlib.util
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import yaml
 
 from utility.send_outlook_email import send_outlook_email
+from watchers import FolderWatcher
+from classifier import FileClassifier
+from snapshot import FolderScanner
+from folder_state import FolderState, PollSchedule, FailureBackoff, IDLE, PENDING, COOLING, RUNNING, DONE
+from update_executor import UpdateExecutor
+from update_worker import run_update_job
+from state_store import StateStore
+from metrics import create_monitoring_metrics
+from log_pipeline import get_logger, configure_logging, flush_logging, log_message
+from config_reload import ConfigReloader
+from leases import LeaseCoordinator
+from fingerprint import FingerprintCache
 
 # --- Config 讀取與全域變數 ---
 def load_monitoring_config(path):
@@ -18,23 +29,22 @@ def load_monitoring_config(path):
         print(f"[ERROR] Cannot load config: {e}")
         sys.exit(1)
 
-monitoring_config = load_monitoring_config('monitoring_config.yaml')
+MONITORING_CONFIG_PATH = 'monitoring_config.yaml'
+monitoring_config = load_monitoring_config(MONITORING_CONFIG_PATH)
 
 # Helper：expandvars 路徑
 def expand_path(path):
     return os.path.expandvars(path)
 
 # --- 工具函式 ---
+logger = get_logger("monitoring")
+
 def print_message(message, message_type="INFO"):
-    symbol = {
-        "INFO": "ℹ",
-        "ACTION": "➤",
-        "WARNING": "⚠️",
-        "ERROR": "❌",
-        "SUCCESS": "🎉"
-    }
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"{symbol.get(message_type, 'ℹ')} [{message_type}] {current_time}: {message}")
+    log_message(logger, message, message_type)
+
+def print_status(message, message_type="STATUS"):
+    # 每輪掃描 / 冷卻倒數等狀態訊息；quiet mode 下唔會輸出
+    log_message(logger, message, message_type, style="plain")
 
 def get_last_save_time(file_path):
     try:
@@ -45,79 +55,349 @@ def get_last_save_time(file_path):
         print_message(f"File {file_path} not found, skipping...", "WARNING")
         return None, None
 
+def notify_update_failure(updating_script_path, monitored_folder_path, error, parked_reason=None):
+    # Optional: email notification if config 裡有 email_recipients
+    if "email_recipients" not in monitoring_config:
+        return
+    if parked_reason:
+        subject = f"Monitoring Paused: Updating Script Keeps Failing - {os.path.basename(updating_script_path)}"
+        body = (f"Updating script '{updating_script_path}' for folder '{monitored_folder_path}' has been paused ({parked_reason}).\n\n"
+                f"It will run again after the Group A files in the folder change.")
+    else:
+        subject = f"Critical Error: Updating Script Failed - {os.path.basename(updating_script_path)}"
+        body = f"Updating script '{updating_script_path}' for folder '{monitored_folder_path}' failed.\n\nError details: {error}"
+    try:
+        send_outlook_email(
+            to_recipients=monitoring_config["email_recipients"].get("to", []),
+            subject=subject,
+            body=body,
+            cc_recipients=monitoring_config["email_recipients"].get("cc", []),
+            bcc_recipients=monitoring_config["email_recipients"].get("bcc", [])
+        )
+        print_message("Critical error notification email sent.", "ACTION")
+    except Exception as mail_error:
+        print_message(f"Failed to send critical error notification email: {mail_error}", "ERROR")
+
 def run_updating_script(updating_script_path, monitored_folder_path):
-    script_name = os.path.basename(updating_script_path).replace('.py', '')
-    original_argv = sys.argv.copy()
+    # 喺目前 process 直接執行（monitor_files 會交給常駐 worker process 執行，見 update_worker.py）
     try:
-        spec = importlib.util.spec_from_file_location(script_name, updating_script_path)
-        if spec is None:
-            raise ImportError(f"Cannot load script {updating_script_path}")
-        module = importlib.util.module_from_spec(spec)
-        sys.modules[script_name] = module
-
-        os.environ["BASE_DIRECTORY_FROM_MONITOR"] = monitored_folder_path
-        sys.argv = [updating_script_path, monitored_folder_path]
         print_message(f"➤ Running update script: {updating_script_path}", "ACTION")
-        spec.loader.exec_module(module)
-        exit_code = module.main()
-        sys.argv = original_argv
-        return exit_code == 0
+        return run_update_job(updating_script_path, monitored_folder_path)
     except Exception as e:
         print_message(f"❌ Error executing script {updating_script_path}: {str(e)}", "ERROR")
-        # Optional: email notification if config 裡有 email_recipients
-        if "email_recipients" in monitoring_config:
-            try:
-                send_outlook_email(
-                    to_recipients=monitoring_config["email_recipients"].get("to", []),
-                    subject=f"Critical Error: Updating Script Failed - {os.path.basename(updating_script_path)}",
-                    body=f"Updating script '{updating_script_path}' for folder '{monitored_folder_path}' failed.\n\nError details: {str(e)}",
-                    cc_recipients=monitoring_config["email_recipients"].get("cc", []),
-                    bcc_recipients=monitoring_config["email_recipients"].get("bcc", [])
-                )
-                print_message("Critical error notification email sent.", "ACTION")
-            except Exception as mail_error:
-                print_message(f"Failed to send critical error notification email: {mail_error}", "ERROR")
+        notify_update_failure(updating_script_path, monitored_folder_path, str(e))
         return False
-    finally:
-        if script_name in sys.modules:
-            del sys.modules[script_name]
-        sys.argv = original_argv
-
-def monitor_folder(monitored_folder_path, file_group_a, file_group_b):
-    group_a_last_times = {}
-    group_b_last_times = {}
-
-    for file_name in os.listdir(monitored_folder_path):
-        file_path = os.path.join(monitored_folder_path, file_name)
-        if os.path.isfile(file_path):
-            last_time, _ = get_last_save_time(file_path)
-            if last_time is None:
-                continue
-            # 支援 regex 或 substring
-            for pattern in file_group_a:
-                if re.search(pattern, file_name):
-                    group_a_last_times[file_name] = last_time
-                    break
-            for pattern in file_group_b:
-                if re.search(pattern, file_name):
-                    group_b_last_times[file_name] = last_time
-                    break
-
-    group_a_newest = max(group_a_last_times.values()) if group_a_last_times else 0
-    group_b_oldest = min(group_b_last_times.values()) if group_b_last_times else float('inf')
+
+def monitor_folder(monitored_folder_path, file_group_a, file_group_b, classifier=None, scanner=None):
+    if scanner is None:
+        if classifier is None:
+            classifier = FileClassifier(file_group_a, file_group_b)
+        scanner = FolderScanner(monitored_folder_path, classifier)
+    # 只處理同上次 snapshot 比較有變動的檔案，Group A 最新 / Group B 最舊時間會逐步更新
+    scanner.scan()
+    group_a_last_times = dict(scanner.group_a.times)
+    group_b_last_times = dict(scanner.group_b.times)
+
+    group_a_newest = scanner.group_a.extreme() if group_a_last_times else 0
+    group_b_oldest = scanner.group_b.extreme() if group_b_last_times else float('inf')
 
     group_a_newest_str = datetime.fromtimestamp(group_a_newest).strftime("%Y-%m-%d %H:%M:%S") if group_a_last_times else "N/A"
     group_b_oldest_str = datetime.fromtimestamp(group_b_oldest).strftime("%Y-%m-%d %H:%M:%S") if group_b_last_times else "N/A"
 
     return group_a_last_times, group_b_last_times, group_a_newest, group_b_oldest, group_a_newest_str, group_b_oldest_str
 
+def scan_folders(scan_jobs, scan_pool=None):
+    # scan_jobs: [(state, monitored_folder_path, scanner), ...]
+    # 有 thread pool 就同時掃描所有資料夾，邊完成邊回傳 (job, result, error)，慢的 share 唔會拖住其他資料夾
+    def scan(job):
+        _state, monitored_folder_path, scanner = job
+        if not os.path.exists(monitored_folder_path):
+            return None
+        return monitor_folder(
+            monitored_folder_path, scanner.classifier.file_group_a, scanner.classifier.file_group_b, scanner=scanner
+        )
+
+    if scan_pool is None:
+        for job in scan_jobs:
+            try:
+                yield job, scan(job), None
+            except Exception as e:
+                yield job, None, e
+        return
+    futures = {scan_pool.submit(scan, job): job for job in scan_jobs}
+    for future in as_completed(futures):
+        try:
+            yield futures[future], future.result(), None
+        except Exception as e:
+            yield futures[future], None, e
+
+def group_a_is_newer(group_a_newest, group_b_oldest):
+    # 以 年/月/日/時/分 比較
+    dt_a = datetime.fromtimestamp(group_a_newest)
+    dt_b = datetime.fromtimestamp(group_b_oldest)
+    return (dt_a.year, dt_a.month, dt_a.day, dt_a.hour, dt_a.minute) >= (dt_b.year, dt_b.month, dt_b.day, dt_b.hour, dt_b.minute)
+
+def evaluate_folder(state, result, cooldown_period):
+    group_a_last_times, group_b_last_times, group_a_newest, group_b_oldest, group_a_newest_str, group_b_oldest_str = result
+    print_status(
+        f"📂 Monitoring: {state.folder_path}\n"
+        f"   - Group A Newest Time: {group_a_newest_str}\n"
+        f"   - Group B Oldest Time: {group_b_oldest_str}"
+    )
+    if state.phase == DONE:
+        state.transition(IDLE)
+    if not (group_a_last_times and group_b_last_times):
+        missing = []
+        if not group_a_last_times:
+            missing.append("Group A")
+        if not group_b_last_times:
+            missing.append("Group B")
+        missing_str = " and ".join(missing)
+        print_message(f"Not all group files found ({missing_str}), skipping this folder", "WARNING")
+        return
+    if not group_a_is_newer(group_a_newest, group_b_oldest):
+        print_status("⏩ Group A is earlier than Group B (in year/month/day/hour/minute), skipping this folder\n")
+        return
+    if not state.is_new_generation(group_a_newest):
+        print_status("⏩ Update for the current Group A files has already run or is in progress, skipping\n")
+        return
+    failures = state.failures
+    if failures.inputs_changed(group_a_newest) and (failures.parked_reason or failures.retry_in() > 0):
+        if failures.parked_reason:
+            print_message(f"Group A files changed in {state.folder_path}, resuming after: {failures.parked_reason}", "ACTION")
+        failures.allow_retry()
+    if failures.parked_reason:
+        print_status(f"⏸ Paused after {failures.parked_reason}; waiting for Group A files to change, skipping\n")
+        return
+    if failures.retry_in() > 0:
+        print_status(f"⏸ Last update failed, retrying in {round(failures.retry_in())} seconds, skipping\n")
+        return
+    dt_a = datetime.fromtimestamp(group_a_newest)
+    dt_b = datetime.fromtimestamp(group_b_oldest)
+    print_message(
+        f"✅ Group A ({dt_a.strftime('%Y-%m-%d %H:%M')}) >= Group B ({dt_b.strftime('%Y-%m-%d %H:%M')}), entering cooldown ({cooldown_period} seconds)...",
+        "ACTION"
+    )
+    # 冷卻期間同實際 mtime 比較（內容指紋模式下 Group A 時間可能係較早的內容改變時間）
+    entries = state.scanner.snapshot.entries if state.scanner is not None else {}
+    state.mark_pending(
+        {file_name: entries.get(file_name, (last_time,))[0] for file_name, last_time in group_a_last_times.items()},
+        group_a_newest
+    )
+
+def advance_folder_state(state, cooldown_period, executor, metrics, coordinator=None):
+    # 每個 tick 推進一次，唔會阻塞其他資料夾；回傳 True 代表需要重新掃描此資料夾
+    if state.phase == PENDING:
+        state.start_cooldown()
+        return False
+    if state.phase == COOLING:
+        updated_file = state.restat_group_a()
+        metrics.inc("monitor_stat_calls_total", state.last_restat_calls, folder=state.folder_path, stage="cooldown")
+        if updated_file is not None:
+            print_status(f"🔁 File \"{updated_file}\" in Group A was updated during cooldown, restarting cooldown timer.", "ACTION")
+            return False
+        time_left = state.cooldown_remaining(cooldown_period)
+        if time_left > 0:
+            print_status(f"⏳ Cooldown in progress for {state.folder_path}... {round(time_left, 1)} seconds left")
+            return False
+        if coordinator is not None and not coordinator.renew(state.folder_path):
+            # 觸發前確認 lease 仍然由本 instance 持有，避免兩部機同時更新
+            print_message(f"Lease for {state.folder_path} is now held by another instance, skipping this update", "WARNING")
+            state.transition(IDLE)
+            return False
+        print_status(f"⏳ Cooldown finished for {state.folder_path}, queueing update script...")
+        print_message(f"Update triggered for: {state.folder_path}", "ACTION")
+        metrics.observe("monitor_cooldown_duration_seconds", time.time() - state.cooldown_entered_at, folder=state.folder_path)
+        status = executor.submit(state.folder_path, state.updating_script_path, state.trigger_generation)
+        if status == "queued":
+            print_message(f"➤ Update script queued: {state.updating_script_path}", "ACTION")
+        else:
+            print_message(f"Update for {state.folder_path} is already queued or running, merged into one follow-up run", "INFO")
+        state.transition(RUNNING)
+        return False
+    return False
+
+def handle_update_result(state, result, executor, metrics, store=None, coordinator=None):
+    # 回傳 True 代表需要重新掃描此資料夾
+    duration = result.finished_at - result.started_at
+    metrics.observe("monitor_trigger_to_start_seconds", max(result.started_at - result.queued_at, 0), folder=state.folder_path)
+    metrics.observe("monitor_trigger_to_finish_seconds", result.finished_at - result.queued_at, folder=state.folder_path)
+    metrics.inc("monitor_updates_total", folder=state.folder_path, result="success" if result.success else "failure")
+    if result.success:
+        print_message(f"Update script executed successfully for {state.folder_path} ({round(duration, 1)} seconds)!", "SUCCESS")
+        state.processed_generation = max(state.processed_generation or 0, result.generation or 0)
+        state.failures.record_success()
+        if coordinator is not None:
+            coordinator.record_generation(state.folder_path, state.processed_generation)
+    else:
+        if result.error:
+            print_message(f"❌ Error executing script {result.updating_script_path}: {result.error}", "ERROR")
+        print_message(f"Update script failed to execute for {state.folder_path}. See error log for details.", "ERROR")
+        # 同一批 Group A 檔案唔會即刻重試：等待時間逐次加倍，連續失敗太多次即暫停
+        delay = state.failures.record_failure(result.generation, result.error)
+        if delay is None:
+            print_message(f"Pausing {state.folder_path} until its Group A files change: {state.failures.parked_reason}", "ERROR")
+            notify_update_failure(result.updating_script_path, state.folder_path, result.error, state.failures.parked_reason)
+        else:
+            print_message(f"Retrying {state.folder_path} in {round(delay)} seconds (failure {state.failures.consecutive_failures})", "WARNING")
+            if state.failures.consecutive_failures == 1:
+                # 只喺第一次失敗及暫停時發通知，重試期間唔再發
+                notify_update_failure(result.updating_script_path, state.folder_path, result.error)
+    state.last_result = result.success
+    if store is not None:
+        store.save_folder_state(state.folder_path, state.processed_generation, state.last_result, state.failures)
+    if state.phase == RUNNING and not executor.is_busy(state.folder_path):
+        state.transition(DONE)
+        return True
+    return False
+
+def write_metrics(metrics, metrics_config):
+    try:
+        metrics.write_files(
+            prometheus_path=expand_path(metrics_config["prometheus_file"]) if metrics_config.get("prometheus_file") else None,
+            json_path=expand_path(metrics_config["json_file"]) if metrics_config.get("json_file") else None
+        )
+    except Exception as e:
+        print_message(f"Cannot write metrics files: {e}", "WARNING")
+
+def apply_logging_config(config):
+    # console / log 檔輸出：quiet mode 只顯示狀態轉變，重複訊息限流
+    logging_config = config.get("logging") or {}
+    configure_logging(
+        level=logging_config.get("level", "STATUS"),
+        quiet=logging_config.get("quiet", False),
+        rate_limit_seconds=logging_config.get("rate_limit_seconds", 60),
+        log_file=expand_path(logging_config["log_file"]) if logging_config.get("log_file") else None
+    )
+
+def folder_schedule_settings(folder, config):
+    # 每個資料夾自己的 polling 間隔：有變動即用 min_interval，閒置時逐步放慢至 max_interval
+    return (
+        folder.get("min_interval", config.get("check_interval", 2)),
+        folder.get("max_interval", config.get("max_check_interval", 60)),
+        folder.get("backoff_factor", config.get("poll_backoff_factor", 2))
+    )
+
+def failure_backoff_settings(config):
+    failure_backoff = config.get("failure_backoff") or {}
+    return (
+        failure_backoff.get("base_delay", 60),
+        failure_backoff.get("max_delay", 3600),
+        failure_backoff.get("max_consecutive_failures", 5)
+    )
+
+def is_recursive(folder, config):
+    return bool(folder.get("recursive", config.get("recursive", False)))
+
+def create_fingerprint_cache(config):
+    # mtime 模式唔計內容指紋
+    change_detection = config.get("change_detection") or {}
+    mode = change_detection.get("mode", "mtime")
+    if mode == "mtime":
+        return None
+    return FingerprintCache(mode, change_detection.get("sample_size", 64 * 1024))
+
+def create_folder_scanner(monitored_folder_path, folder, config):
+    return FolderScanner(
+        monitored_folder_path,
+        FileClassifier(config.get("file_group_a", []), config.get("file_group_b", [])),
+        recursive=is_recursive(folder, config),
+        fingerprints=create_fingerprint_cache(config)
+    )
+
+def create_folder_state(folder, config, watcher, store=None):
+    monitored_folder_path = expand_path(folder["folder_path"])
+    backend = watcher.add_folder(monitored_folder_path, folder.get("watcher"), recursive=is_recursive(folder, config))
+    print_message(f"Watching {monitored_folder_path}{' (including subfolders)' if is_recursive(folder, config) else ''} via {backend}"
+                  f"{' (network share, also polling until change events are confirmed)' if monitored_folder_path in watcher.probation else ''}", "INFO")
+    schedule = PollSchedule(*folder_schedule_settings(folder, config))
+    failures = FailureBackoff(*failure_backoff_settings(config))
+    state = FolderState(monitored_folder_path, expand_path(folder["updating_script"]), schedule=schedule, failures=failures)
+    state.scanner = create_folder_scanner(monitored_folder_path, folder, config)
+    if store is not None:
+        saved = store.load_folder(monitored_folder_path)
+        state.processed_generation = saved["processed_generation"]
+        state.last_result = saved["last_result"]
+        failures.consecutive_failures = saved["consecutive_failures"]
+        failures.failed_generation = saved["failed_generation"]
+        failures.parked_reason = saved["parked_reason"]
+        if failures.parked_reason:
+            print_message(f"{monitored_folder_path} is still paused: {failures.parked_reason}", "WARNING")
+        state.scanner.restore(saved["entries"], saved["fingerprints"])
+    return state
+
+def create_scan_pool(config, folder_count):
+    scan_workers = min(config.get("scan_workers", 8), max(folder_count, 1))
+    return ThreadPoolExecutor(max_workers=scan_workers, thread_name_prefix="scan") if scan_workers > 1 else None
+
+def apply_config_changes(old_config, new_config, states, watcher, executor, store=None):
+    # 套用熱重載的 config：新增 / 移除 / 調整資料夾，未變動的資料夾保留 snapshot 及觸發狀態。
+    # 回傳需要立即掃描的資料夾
+    old_folders = {expand_path(folder["folder_path"]): folder for folder in old_config.get("folders") or []}
+    new_folders = {expand_path(folder["folder_path"]): folder for folder in new_config.get("folders") or []}
+    folders_to_check = set()
+
+    for monitored_folder_path in [path for path in states if path not in new_folders]:
+        watcher.remove_folder(monitored_folder_path)
+        del states[monitored_folder_path]
+        if store is not None:
+            store.forget_folder(monitored_folder_path)
+        print_message(f"Stopped monitoring {monitored_folder_path}", "INFO")
+
+    for monitored_folder_path, folder in new_folders.items():
+        state = states.get(monitored_folder_path)
+        if state is None:
+            states[monitored_folder_path] = create_folder_state(folder, new_config, watcher, store)
+            folders_to_check.add(monitored_folder_path)
+            continue
+        old_folder = old_folders.get(monitored_folder_path, {})
+        state.updating_script_path = expand_path(folder["updating_script"])
+        recursive_changed = is_recursive(folder, new_config) != is_recursive(old_folder, old_config)
+        if recursive_changed or new_config.get("change_detection") != old_config.get("change_detection"):
+            # 改變 recursive 或 change_detection 設定要重新建立 snapshot
+            state.scanner = create_folder_scanner(monitored_folder_path, folder, new_config)
+        if recursive_changed or folder.get("watcher") != old_folder.get("watcher") \
+                or new_config.get("watcher_backend", "auto") != old_config.get("watcher_backend", "auto"):
+            watcher.remove_folder(monitored_folder_path)
+            backend = watcher.add_folder(monitored_folder_path, folder.get("watcher"), recursive=is_recursive(folder, new_config))
+            print_message(f"Watching {monitored_folder_path} via {backend}"
+                          f"{' (network share, also polling until change events are confirmed)' if monitored_folder_path in watcher.probation else ''}", "INFO")
+            folders_to_check.add(monitored_folder_path)
+        state.schedule.retune(*folder_schedule_settings(folder, new_config))
+        state.failures.retune(*failure_backoff_settings(new_config))
+
+    # pattern 改變時，監控 loop 會用現有 snapshot 重新分類（見 FolderScanner.reclassify）
+    for group in ("file_group_a", "file_group_b"):
+        if list(new_config.get(group) or []) != list(old_config.get(group) or []):
+            folders_to_check.update(states)
+
+    watcher.default_backend = new_config.get("watcher_backend", "auto")
+    watcher.rescan_interval = new_config.get("watcher_rescan_interval", 300)
+    executor.resize(new_config.get("max_concurrent_updates", 2))
+    apply_logging_config(new_config)
+
+    old_metrics = old_config.get("metrics") or {}
+    new_metrics = new_config.get("metrics") or {}
+    for key, old_value, new_value in (
+        ("state_store", old_config.get("state_store"), new_config.get("state_store")),
+        ("metrics.http_port", old_metrics.get("http_port"), new_metrics.get("http_port")),
+        ("metrics.http_host", old_metrics.get("http_host"), new_metrics.get("http_host")),
+        ("coordination", old_config.get("coordination"), new_config.get("coordination")),
+    ):
+        if old_value != new_value:
+            print_message(f"Config setting {key} changed, restart monitoring to apply it", "WARNING")
+    return folders_to_check
+
 def monitor_files():
+    global monitoring_config
     folders = monitoring_config.get("folders", [])
     check_interval = monitoring_config.get("check_interval", 2)
     cooldown_period = monitoring_config.get("cooldown_period", 2)
 
-    print(f"\n🚀 Monitoring system started at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"📁 Total folders monitored: {len(folders)}\n")
+    apply_logging_config(monitoring_config)
+
+    print_status(f"\n🚀 Monitoring system started at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", "INFO")
+    print_status(f"📁 Total folders monitored: {len(folders)}\n", "INFO")
 
     # 檢查所有 updating_scripts 是否存在
     for folder in folders:
@@ -126,86 +406,197 @@ def monitor_files():
             print_message(f"Update script not found: {updating_script_path}", "ERROR")
             return
 
-    iteration = 0
+    # config 檔有修改就重新載入（hot_reload: false 即停用）
+    config_reloader = ConfigReloader(MONITORING_CONFIG_PATH) if monitoring_config.get("hot_reload", True) else None
+
+    # 多部機協調：每個資料夾同一時間只由一個 instance 負責（經 share 上的 lease 檔）
+    coordination_config = monitoring_config.get("coordination") or {}
+    coordinator = None
+    if coordination_config.get("enabled"):
+        coordinator = LeaseCoordinator(
+            expand_path(coordination_config["lease_directory"]),
+            instance_id=coordination_config.get("instance_id"),
+            ttl=coordination_config.get("lease_ttl", 60)
+        )
+        print_message(f"Coordinating with other monitor instances as {coordinator.instance_id} via {coordinator.lease_directory}", "INFO")
+
+    # 有原生通知的資料夾只在有事件時才掃描；network share 等就照舊 polling
+    watcher = FolderWatcher(
+        default_backend=monitoring_config.get("watcher_backend", "auto"),
+        rescan_interval=monitoring_config.get("watcher_rescan_interval", 300)
+    )
+    # 運行指標：可寫入 Prometheus text / JSON 檔案，或經本機 HTTP endpoint 提供
+    metrics = create_monitoring_metrics()
+    metrics_config = monitoring_config.get("metrics") or {}
+    metrics_written_at = 0
+    metrics_server = None
+    if metrics_config.get("http_port"):
+        metrics_server = metrics.start_http_server(metrics_config["http_port"], metrics_config.get("http_host", "127.0.0.1"))
+        print_message(f"Metrics available at http://{metrics_config.get('http_host', '127.0.0.1')}:{metrics_config['http_port']}/metrics", "INFO")
+
+    # 上次運行的 snapshot 及已處理的 generation（如有設定 state_store）
+    store = None
+    if monitoring_config.get("state_store"):
+        store = StateStore(expand_path(monitoring_config["state_store"]))
+        print_message(f"Resuming monitor state from {store.db_path}", "INFO")
+
+    # 每個資料夾一個狀態（連同 scanner / classifier），保留上次 snapshot 以便只處理有變動的檔案
+    states = {}
+    for folder in folders:
+        state = create_folder_state(folder, monitoring_config, watcher, store)
+        states[state.folder_path] = state
+
+    # 更新腳本交給常駐 worker process 執行（腳本及 config 只載入一次），監控唔會被長時間的 Excel 更新阻塞
+    executor = UpdateExecutor(run_update_job, max_workers=monitoring_config.get("max_concurrent_updates", 2))
+
+    scan_pool = create_scan_pool(monitoring_config, len(folders))
+
+    iteration = int(store.get_meta("iteration", 0)) if store is not None else 0
+    folders_to_check = set(states)
     try:
         while True:
-            iteration += 1
-            print("\n" + "-"*55)
-            print(f"🔄 Checking folders... (Iteration {iteration})\n")
-            update_triggered = False
-
-            for folder in folders:
-                monitored_folder_path = expand_path(folder["folder_path"])
-                updating_script_path = expand_path(folder["updating_script"])
-                file_group_a = monitoring_config.get("file_group_a", [])
-                file_group_b = monitoring_config.get("file_group_b", [])
-                if not os.path.exists(monitored_folder_path):
-                    print_message(f"Folder not found: {monitored_folder_path}", "WARNING")
-                    continue
+            # config 檔有修改：驗證通過先套用，未變動的資料夾保留現有狀態
+            if config_reloader is not None:
+                new_config, errors = config_reloader.poll()
+                for error in errors:
+                    print_message(f"Config reload rejected, keeping current settings: {error}", "ERROR")
+                if new_config is not None:
+                    print_message(f"Reloading {MONITORING_CONFIG_PATH}", "ACTION")
+                    folders_to_check.update(
+                        apply_config_changes(monitoring_config, new_config, states, watcher, executor, store)
+                    )
+                    monitoring_config = new_config
+                    check_interval = monitoring_config.get("check_interval", 2)
+                    cooldown_period = monitoring_config.get("cooldown_period", 2)
+                    metrics_config = monitoring_config.get("metrics") or {}
+                    if scan_pool is not None:
+                        scan_pool.shutdown(wait=False)
+                    scan_pool = create_scan_pool(monitoring_config, len(states))
+                    if not monitoring_config.get("hot_reload", True):
+                        config_reloader = None
 
-                group_a_last_times, group_b_last_times, group_a_newest, group_b_oldest, group_a_newest_str, group_b_oldest_str = monitor_folder(
-                    monitored_folder_path, file_group_a, file_group_b
+            # 續期 / 取得 / 交出 lease；資料夾只在閒置時先交俾其他 instance
+            if coordinator is not None and coordinator.sync_due():
+                gained, lost = coordinator.sync(
+                    states, can_release=lambda path: states[path].phase in (IDLE, DONE) and not executor.is_busy(path)
                 )
+                for monitored_folder_path, lease in gained.items():
+                    state = states[monitored_folder_path]
+                    if lease.get("processed_generation") is not None:
+                        state.processed_generation = max(state.processed_generation or 0, lease["processed_generation"])
+                    coordinator.record_generation(monitored_folder_path, state.processed_generation)
+                    print_message(f"Now responsible for {monitored_folder_path}", "ACTION")
+                    folders_to_check.add(monitored_folder_path)
+                for monitored_folder_path in lost:
+                    state = states.get(monitored_folder_path)
+                    if state is not None and state.phase in (PENDING, COOLING):
+                        state.transition(IDLE)
+                    print_message(f"{monitored_folder_path} handed over to another instance", "ACTION")
+                metrics.set("monitor_owned_folders", len(coordinator.owned))
 
-                print(
-                    f"📂 Monitoring: {monitored_folder_path}\n"
-                    f"   - Group A Newest Time: {group_a_newest_str}\n"
-                    f"   - Group B Oldest Time: {group_b_oldest_str}"
-                )
+            # 冷卻中 / 執行中的資料夾唔使全面掃描
+            scan_jobs = []
+            file_group_a = monitoring_config.get("file_group_a", [])
+            file_group_b = monitoring_config.get("file_group_b", [])
+            for monitored_folder_path in folders_to_check:
+                state = states.get(monitored_folder_path)
+                if state is None:
+                    continue
+                if not state.is_scannable() or (coordinator is not None and not coordinator.owns(monitored_folder_path)):
+                    state.schedule.postpone()
+                    continue
+                if not state.scanner.classifier.same_patterns(file_group_a, file_group_b):
+                    state.scanner.reclassify(FileClassifier(file_group_a, file_group_b))
+                scan_jobs.append((state, monitored_folder_path, state.scanner))
 
-                if group_a_last_times and group_b_last_times:
-                    dt_a = datetime.fromtimestamp(group_a_newest)
-                    dt_b = datetime.fromtimestamp(group_b_oldest)
-                    if (dt_a.year, dt_a.month, dt_a.day, dt_a.hour, dt_a.minute) >= (dt_b.year, dt_b.month, dt_b.day, dt_b.hour, dt_b.minute):
-                        print_message(
-                            f"✅ Group A ({dt_a.strftime('%Y-%m-%d %H:%M')}) >= Group B ({dt_b.strftime('%Y-%m-%d %H:%M')}), entering cooldown ({cooldown_period} seconds)...",
-                            "ACTION"
+            if scan_jobs:
+                iteration += 1
+                metrics.inc("monitor_iterations_total")
+                if store is not None:
+                    store.set_meta("iteration", iteration)
+                print_status("\n" + "-"*55 + f"\n🔄 Checking folders... (Iteration {iteration})\n")
+                for (state, monitored_folder_path, scanner), result, error in scan_folders(scan_jobs, scan_pool):
+                    diff = scanner.last_diff if result is not None else None
+                    changed = bool(diff and (diff.added or diff.removed or diff.modified))
+                    state.schedule.record(changed)
+                    if result is not None and watcher.record_scan(monitored_folder_path, changed):
+                        print_message(f"No change notifications received for {monitored_folder_path}, switching to polling", "WARNING")
+                    metrics.set("monitor_poll_interval_seconds", state.schedule.interval, folder=monitored_folder_path)
+                    if error is not None:
+                        metrics.inc("monitor_scan_errors_total", folder=monitored_folder_path, reason="error")
+                        print_message(f"Cannot scan folder {monitored_folder_path}: {error}", "ERROR")
+                        continue
+                    if result is None:
+                        metrics.inc("monitor_scan_errors_total", folder=monitored_folder_path, reason="not_found")
+                        print_message(f"Folder not found: {monitored_folder_path}", "WARNING")
+                        continue
+                    metrics.observe("monitor_scan_duration_seconds", scanner.last_scan_duration, folder=monitored_folder_path)
+                    metrics.inc("monitor_stat_calls_total", scanner.last_stat_calls, folder=monitored_folder_path, stage="scan")
+                    if scanner.last_unchanged_content:
+                        metrics.inc("monitor_content_unchanged_total", scanner.last_unchanged_content, folder=monitored_folder_path)
+                        print_status(f"🔍 {scanner.last_unchanged_content} file(s) in {monitored_folder_path} were touched but their content did not change")
+                    if store is not None:
+                        store.save_snapshot_diff(
+                            monitored_folder_path, scanner.snapshot.entries, scanner.last_diff,
+                            scanner.fingerprint_records(scanner.last_diff.added + scanner.last_diff.modified)
                         )
-                        cooldown_start = time.time()
-                        while time.time() - cooldown_start < cooldown_period:
-                            time_left = cooldown_period - (time.time() - cooldown_start)
-                            print(f"⏳ Cooldown in progress... {round(time_left, 1)} seconds left")
-                            time.sleep(check_interval)
-                            all_stable = True
-                            for file_name in group_a_last_times.keys():
-                                file_path = os.path.join(monitored_folder_path, file_name)
-                                if os.path.exists(file_path):
-                                    new_time, _ = get_last_save_time(file_path)
-                                    if new_time is None:
-                                        continue
-                                    if new_time > group_a_last_times[file_name]:
-                                        all_stable = False
-                                        group_a_last_times[file_name] = new_time
-                                        print(f"🔁 File \"{file_name}\" in Group A was updated during cooldown, restarting cooldown timer.")
-                                        cooldown_start = time.time()
-                                        break
-                            if all_stable:
-                                print("⏳ Cooldown finished, executing update script...")
-                                print_message(f"Update triggered for: {monitored_folder_path}", "ACTION")
-                                print_message(f"➤ Running update script: {updating_script_path}", "ACTION")
-                                success = run_updating_script(updating_script_path, monitored_folder_path)
-                                if success:
-                                    print_message("Update script executed successfully!", "SUCCESS")
-                                else:
-                                    print_message("Update script failed to execute. See error log for details.", "ERROR")
-                                update_triggered = True
-                                break
-                    else:
-                        print("⏩ Group A is earlier than Group B (in year/month/day/hour/minute), skipping this folder\n")
-                else:
-                    missing = []
-                    if not group_a_last_times:
-                        missing.append("Group A")
-                    if not group_b_last_times:
-                        missing.append("Group B")
-                    missing_str = " and ".join(missing)
-                    print_message(f"Not all group files found ({missing_str}), skipping this folder", "WARNING")
-            print(f"\n⏳ Waiting {check_interval} seconds before the next check...\n")
-            time.sleep(check_interval)
+                    evaluate_folder(state, result, cooldown_period)
+
+            folders_to_check = set()
+            for monitored_folder_path, state in states.items():
+                if advance_folder_state(state, cooldown_period, executor, metrics, coordinator):
+                    folders_to_check.add(monitored_folder_path)
+            for result in executor.poll():
+                state = states.get(result.folder_path)
+                if state is not None and handle_update_result(state, result, executor, metrics, store, coordinator):
+                    folders_to_check.add(result.folder_path)
+
+            if time.time() - metrics_written_at >= metrics_config.get("write_interval", 15):
+                for state in states.values():
+                    for phase in (IDLE, PENDING, COOLING, RUNNING, DONE):
+                        metrics.set("monitor_folder_phase", int(state.phase == phase), folder=state.folder_path, phase=phase)
+                    metrics.set("monitor_consecutive_failures", state.failures.consecutive_failures, folder=state.folder_path)
+                    metrics.set("monitor_folder_parked", int(bool(state.failures.parked_reason)), folder=state.folder_path)
+                write_metrics(metrics, metrics_config)
+                metrics_written_at = time.time()
+
+            if not folders_to_check:
+                # 等到下一個 polling 資料夾到期；有資料夾冷卻中 / 執行中時最多等 check_interval
+                now = time.monotonic()
+                polled = [states[path] for path in watcher.polled_folders() if path in states]
+                timeout = min([state.schedule.due_in(now) for state in polled] or [check_interval])
+                if any(state.phase in (PENDING, COOLING, RUNNING) for state in states.values()):
+                    timeout = min(timeout, check_interval)
+                # 失敗後等待重試的資料夾
+                timeout = min([timeout] + [state.failures.retry_in(now) for state in states.values() if state.failures.retry_at is not None])
+                if scan_jobs:
+                    print_status(f"\n⏳ Waiting for file changes (next poll in {round(timeout, 1)} seconds)...\n")
+                if config_reloader is not None:
+                    # 最少每 check_interval 秒檢查一次 config 檔有冇修改
+                    timeout = min(timeout, check_interval)
+                if coordinator is not None:
+                    timeout = min(timeout, coordinator.renew_interval)
+                folders_to_check = set(watcher.wait(timeout))
+                now = time.monotonic()
+                folders_to_check.update(state.folder_path for state in polled if state.schedule.is_due(now))
+                folders_to_check.update(state.folder_path for state in states.values() if state.failures.take_due_retry(now))
     except KeyboardInterrupt:
         print_message(f"Monitoring stopped manually at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", "WARNING")
     except Exception as e:
         print_message(f"Error: Exception occurred during monitoring: {str(e)}", "ERROR")
+    finally:
+        watcher.close()
+        executor.shutdown(wait=False)
+        if coordinator is not None:
+            coordinator.close()
+        if store is not None:
+            store.close()
+        write_metrics(metrics, metrics_config)
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        if scan_pool is not None:
+            scan_pool.shutdown(wait=False, cancel_futures=True)
+        flush_logging()
 
 if __name__ == "__main__":
     monitor_files()
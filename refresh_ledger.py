@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import uuid
+import zipfile
+import hashlib
+
+from fingerprint import compute_fingerprint
+from link_graph import workbook_links, normalize_path
+
+# --- 增量更新記錄 ---
+# 每個 workbook 成功更新後，記錄佢所有輸入（外部連結的來源檔、depends_on 的檔案）當時的 size / mtime / 內容指紋，
+# 以及 workbook 自己儲存後的狀態。下次更新時輸入全部冇變（只係 touch 過都算冇變）就可以略過。
+# 以下情況一定會更新：從未更新過、設定改變、workbook 自己被修改過、有 macro、
+# 有 data connection（xl/connections.xml，資料來自資料庫等，判斷唔到有冇變）、加密檔案（讀唔到連結）。
+
+LEDGER_VERSION = 1
+CONNECTIONS_PART = "xl/connections.xml"
+
+
+def _write_json_atomic(path, data):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def has_data_connections(file_path):
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            return CONNECTIONS_PART in archive.namelist()
+    except (OSError, zipfile.BadZipFile):
+        return True
+
+
+def config_key(file_config):
+    data = json.dumps(file_config or {}, sort_keys=True, default=str)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def file_fingerprint(file_path):
+    # [size, mtime, 內容指紋]；檔案唔存在回傳 None
+    try:
+        stat_result = os.stat(file_path)
+        return [stat_result.st_size, stat_result.st_mtime,
+                compute_fingerprint(file_path, stat_result.st_size, "sampled")]
+    except OSError:
+        return None
+
+
+def is_unchanged(file_path, recorded):
+    # 先比較 size + mtime，唔同先計內容指紋
+    if recorded is None:
+        # 上次已經唔存在的來源檔（例如失效的連結）
+        return not os.path.exists(file_path)
+    try:
+        stat_result = os.stat(file_path)
+    except OSError:
+        return False
+    if [stat_result.st_size, stat_result.st_mtime] == recorded[:2]:
+        return True
+    try:
+        return compute_fingerprint(file_path, stat_result.st_size, "sampled") == recorded[2]
+    except OSError:
+        return False
+
+
+class RefreshLedger:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}  # workbook path -> 上次成功更新的記錄
+        self.dirty = False
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == LEDGER_VERSION:
+                self.entries = data.get("workbooks", {})
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    def input_paths(self, workbook_path, extra_inputs=()):
+        # 回傳 None 代表讀唔到連結（例如加密檔案）
+        links = workbook_links(workbook_path)
+        if links is None:
+            return None
+        paths = {normalize_path(path) for path in list(links) + list(extra_inputs)}
+        paths.discard(normalize_path(workbook_path))
+        return sorted(paths)
+
+    def check(self, workbook_path, file_config, extra_inputs=()):
+        # 回傳 (up_to_date, reason)
+        entry = self.entries.get(normalize_path(workbook_path))
+        if entry is None:
+            return False, "no successful refresh recorded"
+        if entry.get("config") != config_key(file_config):
+            return False, "file configuration changed"
+        if (file_config or {}).get("macro"):
+            return False, "runs a macro"
+        if not is_unchanged(workbook_path, entry.get("workbook")):
+            return False, "workbook was modified after the last refresh"
+        if has_data_connections(workbook_path):
+            return False, "has data connections"
+        input_paths = self.input_paths(workbook_path, extra_inputs)
+        if input_paths is None:
+            return False, "external links cannot be read"
+        recorded_inputs = entry.get("inputs", {})
+        if input_paths != sorted(recorded_inputs):
+            return False, "external links changed"
+        for input_path in input_paths:
+            if not is_unchanged(input_path, recorded_inputs[input_path]):
+                return False, f"{os.path.basename(input_path)} changed"
+        refreshed_at = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry.get("refreshed_at", 0)))
+        return True, f"inputs unchanged since {refreshed_at}"
+
+    def record(self, workbook_path, file_config, extra_inputs=()):
+        input_paths = self.input_paths(workbook_path, extra_inputs)
+        self.entries[normalize_path(workbook_path)] = {
+            "refreshed_at": time.time(),
+            "config": config_key(file_config),
+            "workbook": file_fingerprint(workbook_path),
+            "inputs": {input_path: file_fingerprint(input_path) for input_path in input_paths or []},
+        }
+        self.dirty = True
+
+    def forget(self, workbook_path):
+        if self.entries.pop(normalize_path(workbook_path), None) is not None:
+            self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _write_json_atomic(self.path, {"version": LEDGER_VERSION, "workbooks": self.entries})
+        self.dirty = False
@@ -0,0 +1,310 @@
+import os
+import time
+import random
+import fnmatch
+import zipfile
+import threading
+from collections import Counter
+from datetime import datetime
+from xml.etree import ElementTree
+
+from excel_session import XL_EXCEL_LINKS
+from link_graph import read_external_links
+from workbook_metadata import read_core_properties, OLE_SIGNATURE
+
+# --- 模擬 Excel ---
+# 提供同 Excel COM object model 一樣的介面，唔使 Windows / Excel 都可以行成個更新流程（測試及 benchmark 用）：
+#   Application: Workbooks.Open(...)、Run(macro)、CalculateFullRebuild()、Quit()
+#   Workbook: LinkSources()、UpdateLink()、Connections、Save()、Close()、Saved、ReadOnly、BuiltinDocumentProperties
+# workbook 的外部連結及 data connection 直接讀檔案內容（xl/externalLinks、xl/connections.xml），
+# 亦可以喺 workbooks 按檔名 pattern 覆蓋，例如：
+#   workbooks:
+#     "Data*.xlsx": {connections: 2, latency_scale: 3.0}
+#     "BM*.xlsm": {macros: ["Main"], failure_rates: {run_macro: 0.2}}
+# 每個操作按 latencies 等待（± jitter 比例），並按 failure_rates 的機率出錯。
+# Save() 只會更新檔案的修改時間及 Last Author，唔會改寫檔案內容。
+
+OPERATIONS = ("start", "quit", "open", "close", "update_link", "refresh_connection", "calculate", "run_macro", "save")
+DEFAULT_LATENCIES = {
+    "start": 2.0,
+    "quit": 0.5,
+    "open": 1.0,
+    "close": 0.2,
+    "update_link": 0.5,
+    "refresh_connection": 2.0,
+    "calculate": 1.0,
+    "run_macro": 3.0,
+    "save": 0.5,
+}
+MACRO_EXTENSIONS = (".xlsm", ".xlsb", ".xls")
+CONNECTIONS_PART = "xl/connections.xml"
+SPREADSHEET_NAMESPACE = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+
+
+class SimulatedExcelError(Exception):
+    pass
+
+
+def read_connection_names(file_path):
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            if CONNECTIONS_PART not in archive.namelist():
+                return []
+            root = ElementTree.fromstring(archive.read(CONNECTIONS_PART))
+    except (OSError, zipfile.BadZipFile, ElementTree.ParseError):
+        return []
+    return [connection.get("name") or f"Connection{index}"
+            for index, connection in enumerate(root.iter(f"{{{SPREADSHEET_NAMESPACE}}}connection"), 1)]
+
+
+class SimulatedExcelBackend:
+    name = "simulated"
+
+    def __init__(self, latencies=None, failure_rates=None, jitter=0.1, workbooks=None, seed=None,
+                 time_scale=1.0, author="Simulated Excel"):
+        unknown = (set(latencies or {}) | set(failure_rates or {})) - set(OPERATIONS)
+        if unknown:
+            raise ValueError(f"Unknown simulated Excel operation(s): {', '.join(sorted(unknown))}")
+        self.latencies = dict(DEFAULT_LATENCIES, **(latencies or {}))
+        self.failure_rates = dict(failure_rates or {})
+        self.jitter = jitter
+        self.time_scale = time_scale
+        self.profiles = workbooks or {}
+        self.author = author
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = Counter()     # operation -> 次數
+        self.failures = Counter()  # operation -> 模擬出錯次數
+        self.busy_seconds = 0.0
+
+    def profile(self, file_path):
+        # 所有符合檔名 pattern 的設定按次序合併
+        merged = {}
+        file_name = os.path.basename(file_path)
+        for pattern, settings in self.profiles.items():
+            if fnmatch.fnmatch(file_name, pattern):
+                merged.update(settings or {})
+        return merged
+
+    def perform(self, operation, target, profile=None):
+        profile = profile or {}
+        failure_rate = (profile.get("failure_rates") or {}).get(operation, self.failure_rates.get(operation, 0))
+        with self._lock:
+            delay = self.latencies[operation] * profile.get("latency_scale", 1.0) * self.time_scale
+            if self.jitter:
+                delay *= self._random.uniform(1 - self.jitter, 1 + self.jitter)
+            failed = self._random.random() < failure_rate
+            self.calls[operation] += 1
+            self.busy_seconds += delay
+            if failed:
+                self.failures[operation] += 1
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            raise SimulatedExcelError(f"Simulated {operation} failure: {target}")
+
+    def start(self):
+        self.perform("start", "Excel.Application")
+        return SimulatedApplication(self)
+
+    def quit(self, application):
+        application.Quit()
+
+
+class SimulatedApplication:
+    def __init__(self, backend):
+        self.backend = backend
+        self.Visible = False
+        self.DisplayAlerts = True
+        self.EnableEvents = True
+        self.AskToUpdateLinks = True
+        self.Workbooks = SimulatedWorkbooks(self)
+        self.running = True
+
+    def check_running(self):
+        if not self.running:
+            raise SimulatedExcelError("The object invoked has disconnected from its clients")
+
+    def Run(self, macro_name, *args):
+        # "Book.xlsm!Module.Macro" 或 "Macro"
+        self.check_running()
+        book_name, _, name = macro_name.rpartition("!")
+        for workbook in self.Workbooks:
+            if book_name and workbook.Name.lower() != book_name.strip("'").lower():
+                continue
+            if workbook.has_macro(name):
+                self.backend.perform("run_macro", f"{workbook.Name}!{name}", workbook.profile)
+                workbook.Saved = False
+                return None
+        raise SimulatedExcelError(f"Cannot run the macro '{macro_name}'. The macro may not be available "
+                                  f"in this workbook or all macros may be disabled.")
+
+    def CalculateFullRebuild(self):
+        self.check_running()
+        for workbook in self.Workbooks:
+            self.backend.perform("calculate", workbook.Name, workbook.profile)
+            workbook.Saved = False
+
+    def Quit(self):
+        if not self.running:
+            return
+        self.backend.perform("quit", "Excel.Application")
+        # Quit 時未儲存的 workbook 直接放棄（DisplayAlerts = False 時 Excel 都係咁）
+        for workbook in list(self.Workbooks):
+            self.Workbooks.remove(workbook)
+        self.running = False
+
+
+class SimulatedWorkbooks:
+    def __init__(self, application):
+        self.Application = application
+        self._workbooks = []
+
+    def __iter__(self):
+        return iter(list(self._workbooks))
+
+    @property
+    def Count(self):
+        return len(self._workbooks)
+
+    def Item(self, index):
+        return self._workbooks[index - 1]
+
+    def remove(self, workbook):
+        if workbook in self._workbooks:
+            self._workbooks.remove(workbook)
+        workbook.closed = True
+
+    def Open(self, Filename, UpdateLinks=0, ReadOnly=False, Password=None, WriteResPassword=None,
+             IgnoreReadOnlyRecommended=False, Origin=None, **kwargs):
+        self.Application.check_running()
+        workbook = SimulatedWorkbook(self.Application, os.path.abspath(Filename), ReadOnly, Password)
+        # UpdateLinks=3：開檔時已經更新外部連結
+        if UpdateLinks == 3:
+            for link_path in workbook.links:
+                if os.path.exists(link_path):
+                    self.Application.backend.perform("update_link", link_path, workbook.profile)
+        self._workbooks.append(workbook)
+        return workbook
+
+
+class SimulatedProperty:
+    def __init__(self, name, value):
+        self.Name = name
+        self.Value = value
+
+
+class SimulatedConnection:
+    def __init__(self, workbook, name):
+        self.workbook = workbook
+        self.Name = name
+
+    def Refresh(self):
+        self.workbook.check_open()
+        self.workbook.backend.perform("refresh_connection", f"{self.workbook.Name}: {self.Name}", self.workbook.profile)
+        self.workbook.Saved = False
+
+
+class SimulatedConnections:
+    def __init__(self, connections):
+        self._connections = connections
+
+    def __iter__(self):
+        return iter(self._connections)
+
+    @property
+    def Count(self):
+        return len(self._connections)
+
+    def Item(self, index):
+        return self._connections[index - 1]
+
+
+class SimulatedWorkbook:
+    def __init__(self, application, file_path, read_only=False, password=None):
+        self.Application = application
+        self.backend = application.backend
+        self.FullName = file_path
+        self.Name = os.path.basename(file_path)
+        self.Path = os.path.dirname(file_path)
+        self.ReadOnly = bool(read_only)
+        self.Saved = True
+        self.closed = False
+        self.profile = self.backend.profile(file_path)
+        self.backend.perform("open", self.Name, self.profile)
+        if not os.path.isfile(file_path):
+            raise SimulatedExcelError(f"Sorry, we couldn't find {file_path}. Is it possible it was moved, renamed or deleted?")
+        with open(file_path, "rb") as f:
+            encrypted = f.read(len(OLE_SIGNATURE)) == OLE_SIGNATURE
+        expected_password = self.profile.get("open_password")
+        if encrypted and (password is None or (expected_password is not None and password != expected_password)):
+            raise SimulatedExcelError("The password you supplied is not correct.")
+        if "links" in self.profile:
+            self.links = [os.path.join(self.Path, link) for link in self.profile["links"] or []]
+        else:
+            self.links = [] if encrypted else read_external_links(file_path) or []
+        connections = self.profile.get("connections")
+        if connections is None:
+            connections = [] if encrypted else read_connection_names(file_path)
+        elif isinstance(connections, int):
+            connections = [f"Connection{index}" for index in range(1, connections + 1)]
+        self.Connections = SimulatedConnections([SimulatedConnection(self, name) for name in connections])
+        self.macros = self.profile.get("macros")
+        core_properties = None if encrypted else read_core_properties(file_path)
+        self.last_author = core_properties.last_author if core_properties else None
+        self.author = core_properties.creator if core_properties else None
+
+    def check_open(self):
+        if self.closed:
+            raise SimulatedExcelError(f"Workbook {self.Name} is closed")
+        self.Application.check_running()
+
+    def has_macro(self, name):
+        # 未有指定 macros 時，啟用巨集的格式（xlsm 等）接受任何 macro 名稱
+        if self.macros is None:
+            return self.Name.lower().endswith(MACRO_EXTENSIONS)
+        short_name = name.rpartition(".")[2]
+        return name in self.macros or short_name in self.macros
+
+    def BuiltinDocumentProperties(self, name):
+        self.check_open()
+        if name == "Last Author":
+            return SimulatedProperty(name, self.last_author)
+        if name == "Author":
+            return SimulatedProperty(name, self.author)
+        if name == "Last Save Time":
+            return SimulatedProperty(name, datetime.fromtimestamp(os.path.getmtime(self.FullName)))
+        raise SimulatedExcelError("Invalid procedure call or argument")
+
+    def LinkSources(self, Type=XL_EXCEL_LINKS):
+        self.check_open()
+        if Type != XL_EXCEL_LINKS or not self.links:
+            return None
+        return tuple(self.links)
+
+    def UpdateLink(self, Name=None, Type=XL_EXCEL_LINKS):
+        self.check_open()
+        names = [Name] if Name is not None else self.links
+        for link_path in names:
+            if link_path not in self.links:
+                raise SimulatedExcelError(f"Link not found: {link_path}")
+            if not os.path.exists(link_path):
+                raise SimulatedExcelError(f"Cannot update link, source not found: {link_path}")
+            self.backend.perform("update_link", link_path, self.profile)
+        self.Saved = False
+
+    def Save(self):
+        self.check_open()
+        if self.ReadOnly:
+            raise SimulatedExcelError(f"Cannot save {self.Name}: the workbook is read-only")
+        self.backend.perform("save", self.Name, self.profile)
+        os.utime(self.FullName, None)
+        self.last_author = self.backend.author
+        self.Saved = True
+
+    def Close(self, SaveChanges=False):
+        self.check_open()
+        if SaveChanges and not self.Saved:
+            self.Save()
+        self.backend.perform("close", self.Name, self.profile)
+        self.Application.Workbooks.remove(self)
@@ -0,0 +1,251 @@
+import os
+import time
+from collections import namedtuple
+
+# --- 資料夾 snapshot ---
+# 用 os.scandir 一次過取得檔名同 stat（Windows 上 DirEntry 已附帶 stat 資料，唔使再 call 一次），
+# 保留上一次的 snapshot，每次只回傳新增 / 刪除 / 修改咗的檔案。
+# recursive 模式會連子資料夾一齊監控（檔名為相對路徑，如 "sub\file.xlsx"）：
+# 記住每個資料夾本身的 mtime，只重新列出 mtime 有變的資料夾；其他資料夾只重新 stat 被追蹤的檔案。
+
+# 資料夾 mtime 太新（幾秒內）就唔 cache，以免同一時間單位內再有變動而漏咗
+DIRECTORY_SETTLE_SECONDS = 2
+
+SnapshotDiff = namedtuple("SnapshotDiff", ["added", "removed", "modified"])
+
+
+class FolderSnapshot:
+    def __init__(self, folder_path, recursive=False, is_tracked=None):
+        self.folder_path = folder_path
+        self.recursive = recursive
+        self.is_tracked = is_tracked  # recursive 模式：資料夾未變動時，只重新 stat 呢啲檔案
+        self.entries = {}  # file_name -> (mtime, size)
+        self.directories = {}  # 相對路徑 -> (資料夾 mtime, [檔案], [子資料夾])
+        self.stat_calls = 0
+        self.listed_directories = 0
+
+    def _list_entries(self):
+        current = {}
+        with os.scandir(self.folder_path) as it:
+            for entry in it:
+                try:
+                    if not entry.is_file():
+                        continue
+                    stat_result = entry.stat()
+                except OSError:
+                    # 掃描期間檔案被刪除或暫時無法存取
+                    continue
+                self.stat_calls += 1
+                current[entry.name] = (stat_result.st_mtime, stat_result.st_size)
+        return current
+
+    def _list_tree(self, previous):
+        current = {}
+        directories = {}
+        now = time.time()
+        pending = [""]
+        while pending:
+            rel_dir = pending.pop()
+            dir_path = os.path.join(self.folder_path, rel_dir) if rel_dir else self.folder_path
+            try:
+                dir_mtime = os.stat(dir_path).st_mtime
+            except OSError:
+                if not rel_dir:
+                    raise
+                # 子資料夾已被刪除，入面的檔案當作已刪除
+                continue
+            self.stat_calls += 1
+            known = self.directories.get(rel_dir)
+            if known is not None and known[0] is not None and known[0] == dir_mtime:
+                # 資料夾本身冇變（冇新增 / 刪除 / 改名），只重新 stat 被追蹤的檔案
+                _mtime, files, subdirs = known
+                for file_name in files:
+                    info = previous.get(file_name)
+                    if info is None:
+                        continue
+                    if self.is_tracked is None or self.is_tracked(file_name):
+                        try:
+                            stat_result = os.stat(os.path.join(self.folder_path, file_name))
+                        except OSError:
+                            continue
+                        self.stat_calls += 1
+                        info = (stat_result.st_mtime, stat_result.st_size)
+                    current[file_name] = info
+            else:
+                files, subdirs = [], []
+                self.listed_directories += 1
+                with os.scandir(dir_path) as it:
+                    for entry in it:
+                        rel_name = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.append(rel_name)
+                                continue
+                            if not entry.is_file():
+                                continue
+                            stat_result = entry.stat()
+                        except OSError:
+                            continue
+                        self.stat_calls += 1
+                        current[rel_name] = (stat_result.st_mtime, stat_result.st_size)
+                        files.append(rel_name)
+            settled = now - dir_mtime > DIRECTORY_SETTLE_SECONDS
+            directories[rel_dir] = (dir_mtime if settled else None, files, subdirs)
+            pending.extend(subdirs)
+        self.directories = directories
+        return current
+
+    def refresh(self):
+        previous = self.entries
+        current = self._list_tree(previous) if self.recursive else self._list_entries()
+        added = [name for name in current if name not in previous]
+        removed = [name for name in previous if name not in current]
+        modified = [name for name, info in current.items()
+                    if name in previous and previous[name] != info]
+        self.entries = current
+        return SnapshotDiff(added, removed, modified)
+
+
+class GroupTimes:
+    # 追蹤一組檔案的 mtime 及其中最新（newest）或最舊（oldest）的時間；
+    # 只有當極值本身被刪除或改變時才需要重新計算。
+    def __init__(self, newest=True):
+        self.newest = newest
+        self.times = {}
+        self._extreme = None
+        self._dirty = False
+
+    def _better(self, a, b):
+        return a > b if self.newest else a < b
+
+    def set(self, file_name, mtime):
+        old = self.times.get(file_name)
+        self.times[file_name] = mtime
+        if self._dirty:
+            return
+        if self._extreme is None or self._better(mtime, self._extreme):
+            self._extreme = mtime
+        elif old == self._extreme and mtime != old:
+            self._dirty = True
+
+    def discard(self, file_name):
+        old = self.times.pop(file_name, None)
+        if old is not None and old == self._extreme:
+            self._dirty = True
+
+    def extreme(self):
+        if self._dirty:
+            if self.times:
+                self._extreme = max(self.times.values()) if self.newest else min(self.times.values())
+            else:
+                self._extreme = None
+            self._dirty = False
+        return self._extreme
+
+
+class FolderScanner:
+    def __init__(self, folder_path, classifier, recursive=False, fingerprints=None):
+        self.folder_path = folder_path
+        self.classifier = classifier
+        self.recursive = recursive
+        # fingerprints（FingerprintCache）：Group A 檔案只在內容真正改變時先更新時間；None 即只比較 mtime。
+        # Group B 係更新結果，照用 mtime
+        self.fingerprints = fingerprints
+        self.effective_times = {}  # file_name -> 內容最後改變的 mtime
+        self.last_unchanged_content = 0
+        self.snapshot = FolderSnapshot(folder_path, recursive, is_tracked=self._is_tracked)
+        self.group_a = GroupTimes(newest=True)
+        self.group_b = GroupTimes(newest=False)
+        self.last_diff = None
+        self.last_scan_duration = 0.0
+        self.last_stat_calls = 0
+
+    def _classify(self, file_name):
+        # recursive 模式下 pattern 只對檔名本身（唔包括子資料夾路徑）
+        return self.classifier.classify(os.path.basename(file_name) if self.recursive else file_name)
+
+    def _is_tracked(self, file_name):
+        in_group_a, in_group_b = self._classify(file_name)
+        return in_group_a or in_group_b
+
+    def _effective_time(self, file_name, mtime, size):
+        if self.fingerprints is None:
+            return mtime
+        file_path = os.path.join(self.folder_path, file_name)
+        previous = self.fingerprints.previous(file_path)
+        current = self.fingerprints.fingerprint(file_path, mtime, size)
+        effective = self.effective_times.get(file_name)
+        if effective is None or previous is None or current is None or current != previous:
+            effective = mtime
+        else:
+            # 只係 touch 或重新儲存，內容冇變
+            self.last_unchanged_content += 1
+        self.effective_times[file_name] = effective
+        return effective
+
+    def fingerprint_records(self, file_names):
+        # {file_name: (effective_mtime, fingerprint)}，供 StateStore 保存
+        if self.fingerprints is None:
+            return {}
+        return {
+            file_name: (self.effective_times[file_name],
+                        self.fingerprints.previous(os.path.join(self.folder_path, file_name)))
+            for file_name in file_names if file_name in self.effective_times
+        }
+
+    def restore(self, entries, fingerprint_records=None):
+        # 由持久化狀態還原上次的 snapshot，之後第一次 scan 只會回傳停機期間的變動
+        self.snapshot.entries = dict(entries)
+        if self.fingerprints is not None:
+            for file_name, (effective, fingerprint) in (fingerprint_records or {}).items():
+                if file_name not in self.snapshot.entries or effective is None:
+                    continue
+                self.effective_times[file_name] = effective
+                if fingerprint:
+                    mtime, size = self.snapshot.entries[file_name]
+                    self.fingerprints.seed(os.path.join(self.folder_path, file_name), mtime, size, fingerprint)
+        for file_name, (mtime, _size) in self.snapshot.entries.items():
+            in_group_a, in_group_b = self._classify(file_name)
+            mtime = self.effective_times.get(file_name, mtime)
+            if in_group_a:
+                self.group_a.set(file_name, mtime)
+            if in_group_b:
+                self.group_b.set(file_name, mtime)
+
+    def reclassify(self, classifier):
+        # pattern 改變時用現有 snapshot 重新分類，唔使重新掃描資料夾
+        self.classifier = classifier
+        self.group_a = GroupTimes(newest=True)
+        self.group_b = GroupTimes(newest=False)
+        self.restore(self.snapshot.entries)
+
+    def scan(self):
+        started = time.perf_counter()
+        stat_calls_before = self.snapshot.stat_calls
+        diff = self.snapshot.refresh()
+        self.last_diff = diff
+        self.last_unchanged_content = 0
+        for file_name in diff.removed:
+            self.group_a.discard(file_name)
+            self.group_b.discard(file_name)
+            if not self.recursive:
+                self.classifier.forget(file_name)
+            if self.fingerprints is not None:
+                self.effective_times.pop(file_name, None)
+                self.fingerprints.forget(os.path.join(self.folder_path, file_name))
+        for file_name in diff.added + diff.modified:
+            mtime, size = self.snapshot.entries[file_name]
+            in_group_a, in_group_b = self._classify(file_name)
+            if in_group_a:
+                mtime = self._effective_time(file_name, mtime, size)
+            if in_group_a:
+                self.group_a.set(file_name, mtime)
+            if in_group_b:
+                self.group_b.set(file_name, mtime)
+        if diff.removed and self.recursive:
+            # recursive 模式 cache 用檔名本身，同名檔案可能喺其他子資料夾仍然存在，按現有檔名整體清理
+            # （要喺新增檔案 classify 之後先做，否則同一次掃描有刪有加時會漏咗清理）
+            self.classifier.retain({os.path.basename(file_name) for file_name in self.snapshot.entries})
+        self.last_scan_duration = time.perf_counter() - started
+        self.last_stat_calls = self.snapshot.stat_calls - stat_calls_before
+        return diff
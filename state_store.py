@@ -0,0 +1,120 @@
+import sqlite3
+import time
+
+# --- 監控狀態持久化 ---
+# 每個資料夾的 snapshot、最後成功處理的 Group A generation 及 iteration 計數存入本機 SQLite，
+# 重新啟動時可以從上次狀態繼續，只對停機期間真正有變動的檔案作出反應。
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS folder_state (
+    folder_path TEXT PRIMARY KEY,
+    processed_generation REAL,
+    last_result INTEGER,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS snapshot_entries (
+    folder_path TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (folder_path, file_name)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# 舊版 state.db 冇嘅欄位，開啟時補上
+ADDED_COLUMNS = {
+    "snapshot_entries": (("effective_mtime", "REAL"), ("fingerprint", "TEXT")),
+    "folder_state": (("consecutive_failures", "INTEGER"), ("failed_generation", "REAL"), ("parked_reason", "TEXT")),
+}
+
+
+class StateStore:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._add_missing_columns()
+        self.conn.commit()
+
+    def _add_missing_columns(self):
+        for table, added_columns in ADDED_COLUMNS.items():
+            columns = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+            for column, column_type in added_columns:
+                if column not in columns:
+                    self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+    def load_folder(self, folder_path):
+        row = self.conn.execute(
+            "SELECT processed_generation, last_result, consecutive_failures, failed_generation, parked_reason "
+            "FROM folder_state WHERE folder_path = ?",
+            (folder_path,)
+        ).fetchone()
+        entries, fingerprints = {}, {}
+        for file_name, mtime, size, effective_mtime, fingerprint in self.conn.execute(
+            "SELECT file_name, mtime, size, effective_mtime, fingerprint FROM snapshot_entries WHERE folder_path = ?",
+            (folder_path,)
+        ):
+            entries[file_name] = (mtime, size)
+            if effective_mtime is not None:
+                fingerprints[file_name] = (effective_mtime, fingerprint)
+        processed_generation, last_result, consecutive_failures, failed_generation, parked_reason = row if row else (None,) * 5
+        return {
+            "processed_generation": processed_generation,
+            "last_result": None if last_result is None else bool(last_result),
+            "consecutive_failures": consecutive_failures or 0,
+            "failed_generation": failed_generation,
+            "parked_reason": parked_reason,
+            "entries": entries,
+            "fingerprints": fingerprints,
+        }
+
+    def save_snapshot_diff(self, folder_path, entries, diff, fingerprints=None):
+        # 只寫入有變動的檔案；fingerprints: {file_name: (effective_mtime, fingerprint)}
+        if not (diff.added or diff.removed or diff.modified):
+            return
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM snapshot_entries WHERE folder_path = ? AND file_name = ?",
+                [(folder_path, file_name) for file_name in diff.removed]
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO snapshot_entries (folder_path, file_name, mtime, size, effective_mtime, fingerprint) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(folder_path, file_name, entries[file_name][0], entries[file_name][1])
+                 + (fingerprints or {}).get(file_name, (None, None))
+                 for file_name in diff.added + diff.modified]
+            )
+
+    def save_folder_state(self, folder_path, processed_generation, last_result, failures=None):
+        # failures: FailureBackoff，保存連續失敗次數及暫停原因
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO folder_state (folder_path, processed_generation, last_result, updated_at, "
+                "consecutive_failures, failed_generation, parked_reason) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (folder_path, processed_generation, None if last_result is None else int(last_result), time.time(),
+                 failures.consecutive_failures if failures else 0,
+                 failures.failed_generation if failures else None,
+                 failures.parked_reason if failures else None)
+            )
+
+    def forget_folder(self, folder_path):
+        with self.conn:
+            self.conn.execute("DELETE FROM folder_state WHERE folder_path = ?", (folder_path,))
+            self.conn.execute("DELETE FROM snapshot_entries WHERE folder_path = ?", (folder_path,))
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,35 @@
+import os
+
+from classifier import FileClassifier
+from fingerprint import FingerprintCache
+from folder_state import FolderState
+from snapshot import FolderScanner
+
+
+def start_cooling(tmp_path):
+    (tmp_path / "Data 1.xlsx").write_bytes(b"first")
+    scanner = FolderScanner(str(tmp_path), FileClassifier(["Data"], ["Summary"]),
+                            fingerprints=FingerprintCache("full"))
+    scanner.scan()
+    state = FolderState(str(tmp_path), "updating.py", scanner=scanner)
+    state.mark_pending(scanner.group_a.times, scanner.group_a.extreme() or 0)
+    state.start_cooldown()
+    return state
+
+
+def test_restat_ignores_touch_without_content_change(tmp_path):
+    state = start_cooling(tmp_path)
+    generation = state.trigger_generation
+    file_time = os.path.getmtime(tmp_path / "Data 1.xlsx")
+    os.utime(tmp_path / "Data 1.xlsx", (file_time + 10, file_time + 10))
+    assert state.restat_group_a() is None
+    assert state.trigger_generation == generation
+
+
+def test_restat_restarts_cooldown_on_content_change(tmp_path):
+    state = start_cooling(tmp_path)
+    file_time = os.path.getmtime(tmp_path / "Data 1.xlsx")
+    (tmp_path / "Data 1.xlsx").write_bytes(b"second")
+    os.utime(tmp_path / "Data 1.xlsx", (file_time + 10, file_time + 10))
+    assert state.restat_group_a() == "Data 1.xlsx"
+    assert state.trigger_generation == file_time + 10
@@ -0,0 +1,58 @@
+import json
+import subprocess
+import sys
+
+from leases import LeaseCoordinator, rendezvous_owner
+
+FOLDERS = [f"/share/w{index}" for index in range(10)]
+
+
+def owned_by(coordinators):
+    return {coordinator.instance_id: set(coordinator.owned) for coordinator in coordinators}
+
+
+def test_two_coordinators_hand_over_released_folders(tmp_path):
+    i1 = LeaseCoordinator(str(tmp_path), instance_id="i1", ttl=30)
+    gained, _ = i1.sync(FOLDERS)
+    assert set(gained) == set(FOLDERS)
+
+    # i2 加入：i1 交出分配俾 i2 的資料夾，之後唔可以即刻攞返
+    i2 = LeaseCoordinator(str(tmp_path), instance_id="i2", ttl=30)
+    i2.sync(FOLDERS)
+    _, lost = i1.sync(FOLDERS)
+    expected_i2 = {folder for folder in FOLDERS if rendezvous_owner(folder, ["i1", "i2"]) == "i2"}
+    assert expected_i2 and set(lost) == expected_i2
+
+    regained, _ = i1.sync(FOLDERS)
+    assert not regained
+    gained, _ = i2.sync(FOLDERS)
+    assert set(gained) == expected_i2
+
+    for _ in range(3):
+        i1.sync(FOLDERS)
+        i2.sync(FOLDERS)
+    owners = owned_by([i1, i2])
+    assert owners["i2"] == expected_i2
+    assert owners["i1"] == set(FOLDERS) - expected_i2
+
+
+def test_restarted_instance_takes_back_its_folders_only_after_old_process_exited(tmp_path):
+    first = LeaseCoordinator(str(tmp_path), instance_id="i1", ttl=30)
+    first.sync(FOLDERS[:2])
+
+    # 同一個 process 仍然持有 lease：唔當係重新啟動
+    second = LeaseCoordinator(str(tmp_path), instance_id="i1", ttl=30)
+    gained, _ = second.sync(FOLDERS[:2])
+    assert not gained
+
+    # 舊 process 已結束（用一個已經退出的 pid 模擬）
+    dead_pid = int(subprocess.check_output([sys.executable, "-c", "import os; print(os.getpid())"]))
+    for folder in FOLDERS[:2]:
+        path = second._lease_path(folder)
+        with open(path, "r", encoding="utf-8") as f:
+            lease = json.load(f)
+        lease["pid"] = dead_pid
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(lease, f)
+    gained, _ = second.sync(FOLDERS[:2])
+    assert set(gained) == set(FOLDERS[:2])
@@ -0,0 +1,22 @@
+from link_graph import strongly_connected_components, topological_waves
+
+
+def test_independent_workbooks_share_a_wave():
+    assert topological_waves(range(3), {2: {0}}) == ([[0, 1], [2]], [])
+
+
+def test_only_nodes_in_a_cycle_are_reported_as_cyclic():
+    # 0 ⇄ 1 係循環；2 只係喺循環下游，3 → 4 同循環無關
+    dependencies = {0: {1}, 1: {0}, 2: {1}, 4: {3}}
+    waves, cyclic = topological_waves(range(5), dependencies)
+    assert cyclic == [0, 1]
+    assert waves == [[3], [0], [1], [2, 4]]
+
+
+def test_self_link_counts_as_cycle():
+    assert topological_waves(range(2), {0: {0}, 1: {0}}) == ([[0], [1]], [0])
+
+
+def test_strongly_connected_components_keep_config_order():
+    components = strongly_connected_components([0, 1, 2, 3], {0: {2}, 1: {0}, 2: {1}, 3: {2}})
+    assert sorted(components) == [[0, 1, 2], [3]]
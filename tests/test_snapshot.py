@@ -0,0 +1,40 @@
+import os
+
+from classifier import FileClassifier
+from snapshot import FolderScanner
+
+
+def test_recursive_scan_evicts_removed_file_names_from_classifier_cache(tmp_path):
+    (tmp_path / "sub").mkdir()
+    for name in ("Data 1.xlsx", "sub/Data 1.xlsx", "sub/ABCD1234", "~$Data 1.xlsx"):
+        (tmp_path / name).write_bytes(b"x")
+    classifier = FileClassifier(["Data"], ["Summary"])
+    scanner = FolderScanner(str(tmp_path), classifier, recursive=True)
+    scanner.scan()
+    assert set(classifier._cache) == {"Data 1.xlsx", "ABCD1234", "~$Data 1.xlsx"}
+
+    # Excel 暫存檔消失；同名檔案只刪除其中一個
+    os.remove(tmp_path / "sub" / "ABCD1234")
+    os.remove(tmp_path / "~$Data 1.xlsx")
+    os.remove(tmp_path / "sub" / "Data 1.xlsx")
+    os.utime(tmp_path / "sub", None)
+    scanner.scan()
+    assert set(classifier._cache) == {"Data 1.xlsx"}
+    assert set(scanner.group_a.times) == {"Data 1.xlsx"}
+
+
+def test_recursive_scan_evicts_removed_file_name_when_another_is_added(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "Data 1.xlsx").write_bytes(b"x")
+    (tmp_path / "sub" / "AAAA1111").write_bytes(b"x")
+    classifier = FileClassifier(["Data"], ["Summary"])
+    scanner = FolderScanner(str(tmp_path), classifier, recursive=True)
+    scanner.scan()
+    assert set(classifier._cache) == {"Data 1.xlsx", "AAAA1111"}
+
+    # 同一次掃描一個暫存檔消失、另一個出現，cache 數量不變
+    os.remove(tmp_path / "sub" / "AAAA1111")
+    (tmp_path / "sub" / "BBBB2222").write_bytes(b"x")
+    os.utime(tmp_path / "sub", None)
+    scanner.scan()
+    assert set(classifier._cache) == {"Data 1.xlsx", "BBBB2222"}
@@ -0,0 +1,64 @@
+import os
+import shutil
+import zipfile
+
+import yaml
+
+import update_worker
+from conftest import project_dir
+
+UPDATING_SCRIPT_PATH = os.path.join(project_dir, "updating.py")
+
+
+def use_shipped_config(tmp_path, monkeypatch, **advanced_settings):
+    # updating.py 喺目前目錄讀取 updating_config.yaml；只改 log 位置及 Excel 後端，其他同 repo 的 config 一樣
+    with open(os.path.join(project_dir, "updating_config.yaml"), "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+    assert "base_directory" not in config
+    config["log_directory"] = str(tmp_path / "log")
+    config["advanced_settings"].update(advanced_settings)
+    with open(tmp_path / "updating_config.yaml", "w", encoding="utf-8") as f:
+        yaml.safe_dump(config, f, allow_unicode=True)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("BASE_DIRECTORY_FROM_MONITOR", raising=False)
+    monkeypatch.setattr(update_worker, "_loaded_scripts", {})
+
+
+def test_update_module_loads_without_base_directory(tmp_path, monkeypatch):
+    shutil.copy(os.path.join(project_dir, "updating_config.yaml"), tmp_path / "updating_config.yaml")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("BASE_DIRECTORY_FROM_MONITOR", raising=False)
+    monkeypatch.setattr(update_worker, "_loaded_scripts", {})
+    module = update_worker.load_update_module(UPDATING_SCRIPT_PATH)
+    assert module.base_directory is None
+
+
+def test_run_update_job_with_shipped_config(tmp_path, monkeypatch):
+    use_shipped_config(tmp_path, monkeypatch, automation_backend="simulated")
+    folder = tmp_path / "data"
+    folder.mkdir()
+    assert update_worker.run_update_job(UPDATING_SCRIPT_PATH, str(folder))
+    # 常駐 worker 重用已載入的腳本處理另一個資料夾
+    other_folder = tmp_path / "other"
+    other_folder.mkdir()
+    assert update_worker.run_update_job(UPDATING_SCRIPT_PATH, str(other_folder))
+    assert len(update_worker._loaded_scripts) == 1
+
+
+def write_workbook(file_path):
+    with zipfile.ZipFile(file_path, "w") as archive:
+        archive.writestr("[Content_Types].xml", "<Types/>")
+        archive.writestr("xl/workbook.xml", "<workbook/>")
+
+
+def test_parallel_refresh_with_shipped_config(tmp_path, monkeypatch):
+    use_shipped_config(tmp_path, monkeypatch, automation_backend="simulated", simulated_excel={"time_scale": 0},
+                       max_parallel_workbooks=2, incremental_refresh=False)
+    folder = tmp_path / "data"
+    folder.mkdir()
+    for name in ("Data - All 1.xlsx", "Data - All 2.xlsx"):
+        write_workbook(folder / name)
+    module = update_worker.load_update_module(UPDATING_SCRIPT_PATH)
+    summary = module.process_excel_files_in_directory(str(folder), module.file_configs)
+    assert sorted(summary["processed"]) == ["Data - All 1.xlsx", "Data - All 2.xlsx"]
+    assert not summary["failed"]
@@ -0,0 +1,60 @@
+import pytest
+
+import watchers
+from watchers import FolderWatcher, InotifyWatcher
+
+pytestmark = pytest.mark.skipif(not InotifyWatcher.is_supported(), reason="needs inotify")
+
+
+@pytest.fixture
+def network_watcher(monkeypatch):
+    monkeypatch.setattr(watchers, "is_network_path", lambda folder_path: True)
+    watcher = FolderWatcher()
+    yield watcher
+    watcher.close()
+
+
+def test_network_share_stops_polling_once_events_arrive(network_watcher, tmp_path):
+    folder = str(tmp_path)
+    assert network_watcher.add_folder(folder) == "inotify"
+    assert folder in network_watcher.polled_folders()
+    network_watcher.record_scan(folder, False)
+
+    (tmp_path / "a.xlsx").write_bytes(b"x")
+    assert folder in network_watcher.wait(1)
+    assert not network_watcher.record_scan(folder, True)
+    assert folder not in network_watcher.polled_folders()
+    assert network_watcher.backends[folder] == "inotify"
+
+
+def test_network_share_without_events_falls_back_to_polling(network_watcher, tmp_path):
+    folder = str(tmp_path)
+    network_watcher.add_folder(folder)
+    network_watcher.record_scan(folder, False)
+    assert not network_watcher.record_scan(folder, True)
+    assert network_watcher.record_scan(folder, True)
+    assert network_watcher.backends[folder] == "polling"
+    assert folder in network_watcher.polled_folders()
+    assert folder not in network_watcher.native.folders
+
+
+def test_quiet_network_share_stops_polling_after_probation(network_watcher, tmp_path):
+    folder = str(tmp_path)
+    network_watcher.probation_period = 0
+    network_watcher.add_folder(folder)
+    network_watcher.wait(0)
+    assert folder not in network_watcher.polled_folders()
+    assert network_watcher.backends[folder] == "inotify"
+
+
+def test_late_native_event_resets_missed_event_count(network_watcher, tmp_path):
+    folder = str(tmp_path)
+    network_watcher.add_folder(folder)
+    network_watcher.record_scan(folder, False)
+    # polling 先發現變更，事件喺下一次掃描前先到
+    assert not network_watcher.record_scan(folder, True)
+    (tmp_path / "a.xlsx").write_bytes(b"x")
+    assert folder in network_watcher.wait(1)
+    assert not network_watcher.record_scan(folder, False)
+    assert not network_watcher.record_scan(folder, True)
+    assert network_watcher.backends[folder] == "inotify"
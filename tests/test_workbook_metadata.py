@@ -0,0 +1,33 @@
+import zipfile
+
+from workbook_metadata import owner_file_path, probe_workbook
+
+
+def write_workbook(file_path):
+    with zipfile.ZipFile(file_path, "w") as archive:
+        archive.writestr("[Content_Types].xml", "<Types/>")
+        archive.writestr("xl/workbook.xml", "<workbook/>")
+
+
+def write_owner_file(file_path, owner):
+    with open(file_path, "wb") as f:
+        f.write(bytes([len(owner)]) + owner.encode("latin-1"))
+
+
+def test_stale_owner_file_only_warns(tmp_path):
+    workbook = tmp_path / "Data - All.xlsx"
+    write_workbook(workbook)
+    write_owner_file(tmp_path / "~$Data - All.xlsx", "alice")
+    probe = probe_workbook(str(workbook))
+    assert probe.accessible
+    assert "alice" in probe.warning
+
+
+def test_owner_file_of_another_workbook_is_ignored(tmp_path):
+    workbook = tmp_path / "ABook.xlsx"
+    write_workbook(workbook)
+    # "~$" + "Book.xlsx" 屬於另一個 workbook（Book.xlsx）
+    write_owner_file(tmp_path / "~$Book.xlsx", "bob")
+    assert owner_file_path(str(workbook)) is None
+    probe = probe_workbook(str(workbook))
+    assert probe.accessible and probe.warning is None
@@ -0,0 +1,131 @@
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# --- 更新腳本執行子系統 ---
+# 觸發後的更新工作放入每個資料夾自己的佇列，由常駐 worker process 執行（見 update_worker.py），
+# 監控 loop 唔會被阻塞。
+# 同一資料夾已在佇列或執行中時，重複的觸發會合併成一次 follow-up run。
+
+JobResult = namedtuple(
+    "JobResult",
+    ["folder_path", "updating_script_path", "success", "error", "generation",
+     "queued_at", "started_at", "finished_at", "merged_triggers"]
+)
+
+
+class UpdateJob:
+    def __init__(self, folder_path, updating_script_path, generation=None, options=None):
+        self.folder_path = folder_path
+        self.updating_script_path = updating_script_path
+        self.generation = generation
+        self.options = dict(options or {})
+        self.queued_at = time.time()
+        self.started_at = None
+        self.merged_triggers = 0
+
+    def merge(self, updating_script_path, generation, options=None):
+        self.updating_script_path = updating_script_path
+        self.options.update(options or {})
+        if generation is not None:
+            self.generation = max(self.generation or 0, generation)
+        self.merged_triggers += 1
+
+
+def _timed_call(run_job, updating_script_path, monitored_folder_path, options):
+    # 喺 worker process 入面執行，連同實際開始 / 完成時間一齊回傳
+    started_at = time.time()
+    success = bool(run_job(updating_script_path, monitored_folder_path, options))
+    return success, started_at, time.time()
+
+
+class UpdateExecutor:
+    def __init__(self, run_job, max_workers=2):
+        self.run_job = run_job
+        self.max_workers = max(int(max_workers), 1)
+        self._pool = None
+        self._running = {}  # folder_path -> (future, job)
+        self._queued = OrderedDict()  # folder_path -> job（每個資料夾最多一個）
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def _reset_pool(self):
+        # worker process 崩潰（例如 Excel COM 出錯）後 pool 會失效，下次 dispatch 時重建
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def resize(self, max_workers):
+        # 新的 worker 數目喺 pool 下次重建時生效；冇工作執行中就即時重建
+        max_workers = max(int(max_workers), 1)
+        if max_workers == self.max_workers:
+            return
+        self.max_workers = max_workers
+        if not self._running:
+            self._reset_pool()
+
+    def submit(self, folder_path, updating_script_path, generation=None, options=None):
+        # 回傳 "queued"、"follow-up"（執行中，完成後再跑一次）或 "merged"（已有工作在佇列）
+        queued_job = self._queued.get(folder_path)
+        if queued_job is not None:
+            queued_job.merge(updating_script_path, generation, options)
+            return "merged"
+        self._queued[folder_path] = UpdateJob(folder_path, updating_script_path, generation, options)
+        status = "follow-up" if folder_path in self._running else "queued"
+        self._dispatch()
+        return status
+
+    def _dispatch(self):
+        for folder_path in list(self._queued):
+            if len(self._running) >= self.max_workers:
+                break
+            if folder_path in self._running:
+                continue
+            job = self._queued.pop(folder_path)
+            job.started_at = time.time()
+            try:
+                future = self._get_pool().submit(
+                    _timed_call, self.run_job, job.updating_script_path, job.folder_path, job.options
+                )
+            except BrokenProcessPool:
+                self._reset_pool()
+                future = self._get_pool().submit(
+                    _timed_call, self.run_job, job.updating_script_path, job.folder_path, job.options
+                )
+            self._running[folder_path] = (future, job)
+
+    def poll(self):
+        results = []
+        for folder_path, (future, job) in list(self._running.items()):
+            if not future.done():
+                continue
+            del self._running[folder_path]
+            error = None
+            started_at, finished_at = job.started_at, time.time()
+            try:
+                success, started_at, finished_at = future.result()
+            except BrokenProcessPool as e:
+                success, error = False, f"Update worker process crashed: {e}"
+                self._reset_pool()
+            except Exception as e:
+                success, error = False, str(e)
+            results.append(JobResult(
+                folder_path, job.updating_script_path, success, error, job.generation,
+                job.queued_at, started_at, finished_at, job.merged_triggers
+            ))
+        if results:
+            self._dispatch()
+        return results
+
+    def is_busy(self, folder_path):
+        return folder_path in self._running or folder_path in self._queued
+
+    def shutdown(self, wait=False):
+        self._queued.clear()
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,56 @@
+import os
+import sys
+import inspect
+import importlib.util
+
+# --- 常駐更新 worker ---
+# 喺 worker process 入面執行。更新腳本（及其 config）只載入一次，之後每次觸發直接重用；
+# 只有當腳本或 config 檔案的修改時間改變時才重新載入。
+
+_loaded_scripts = {}  # updating_script_path -> (module, signature)
+
+
+def _script_signature(updating_script_path, config_path):
+    signature = [os.path.getmtime(updating_script_path)]
+    if config_path and os.path.exists(config_path):
+        signature.append(os.path.getmtime(config_path))
+    return tuple(signature)
+
+
+def load_update_module(updating_script_path, force_reload=False):
+    cached = _loaded_scripts.get(updating_script_path)
+    if cached is not None and not force_reload:
+        module, signature = cached
+        if signature == _script_signature(updating_script_path, getattr(module, "_worker_config_path", None)):
+            return module
+    script_name = os.path.basename(updating_script_path).replace('.py', '')
+    spec = importlib.util.spec_from_file_location(f"{script_name}_worker", updating_script_path)
+    if spec is None:
+        raise ImportError(f"Cannot load script {updating_script_path}")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    config_path = getattr(module, "UPDATING_CONFIG_PATH", None)
+    module._worker_config_path = os.path.abspath(config_path) if config_path else None
+    _loaded_scripts[updating_script_path] = (module, _script_signature(updating_script_path, module._worker_config_path))
+    return module
+
+
+def run_update_job(updating_script_path, monitored_folder_path, options=None):
+    options = dict(options or {})
+    # 舊式腳本喺 import 時經 sys.argv / 環境變數讀取資料夾路徑，所以第一次載入前就要設定好（只影響 worker process）
+    original_argv = sys.argv.copy()
+    os.environ["BASE_DIRECTORY_FROM_MONITOR"] = monitored_folder_path
+    sys.argv = [updating_script_path, monitored_folder_path]
+    try:
+        cached = _loaded_scripts.get(updating_script_path)
+        module = load_update_module(updating_script_path)
+        if "base_directory" in inspect.signature(module.main).parameters:
+            exit_code = module.main(base_directory=monitored_folder_path, **options)
+        else:
+            if cached is not None and module is cached[0]:
+                # 沿用咗之前為其他資料夾載入的舊式腳本，要重新載入
+                module = load_update_module(updating_script_path, force_reload=True)
+            exit_code = module.main()
+    finally:
+        sys.argv = original_argv
+    return exit_code == 0
@@ -1,11 +1,15 @@
 import os
-import win32com.client as win32
+import sys
 import time
 import logging
-from openpyxl import load_workbook
 from datetime import datetime
 from pathlib import Path
-from utility.send_outlook_email import send_outlook_email
+from log_pipeline import get_logger, set_log_file, flush_logging, log_message
+from excel_session import ExcelSession, create_backend, AUTOMATION_BACKENDS, XL_EXCEL_LINKS, XL_WINDOWS
+from workbook_pool import WorkbookPool
+from link_graph import build_refresh_waves
+from refresh_ledger import RefreshLedger
+from workbook_metadata import read_workbook_metadata, probe_workbook, LinkSourceCache
 import yaml
 
 # --- Config 讀取與全域變數 ---
@@ -18,7 +22,8 @@ def load_updating_config(path):
         print(f"[ERROR] Cannot load config: {e}")
         exit(1)
 
-updating_config = load_updating_config('updating_config.yaml')
+UPDATING_CONFIG_PATH = 'updating_config.yaml'
+updating_config = load_updating_config(UPDATING_CONFIG_PATH)
 
 # 支援外部 BASE_DIRECTORY 覆蓋
 if os.environ.get("BASE_DIRECTORY_FROM_MONITOR"):
@@ -31,14 +36,17 @@ email_subject = updating_config["email_subject_prefix"]
 log_directory = updating_config["log_directory"]
 file_configs = updating_config["file_configs"]
 advanced_settings = updating_config["advanced_settings"]
-base_directory = updating_config["base_directory"]
+# base_directory 可以唔寫喺 config（由 monitoring 傳入），真正使用的路徑喺 main() 決定
+base_directory = updating_config.get("base_directory")
 
 logger = None
+# linked source 的 metadata，每次 batch 開始時清空（見 process_excel_files_in_directory）
+link_source_cache = LinkSourceCache()
 
 class ExcelAutomationError(Exception):
     pass
 
-def setup_logging():
+def setup_logging(base_directory):
     global logger
     Path(log_directory).mkdir(parents=True, exist_ok=True)
     current_time = datetime.now()
@@ -46,43 +54,38 @@ def setup_logging():
     log_filepath = os.path.join(log_directory, log_filename)
     os.environ["log_filepath"] = log_filepath
 
-    logger = logging.getLogger('ExcelAutomation')
-    logger.handlers.clear()
-    file_handler = logging.FileHandler(log_filepath, encoding='utf-8')
-    file_formatter = logging.Formatter('%(asctime)s | %(levelname)-8s | %(message)s')
-    file_handler.setFormatter(file_formatter)
-    console_handler = logging.StreamHandler()
-    console_formatter = logging.Formatter('[%(asctime)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
-    console_handler.setFormatter(console_formatter)
+    # console 及 log 檔輸出都經共用的 logging pipeline（見 log_pipeline.py）
+    logger = get_logger('updating')
     logger.setLevel(logging.INFO)
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-    logger.propagate = False
+    set_log_file('updating', log_filepath)
 
-    logger.info("=" * 80)
-    logger.info("🚀 Excel automation program started")
-    logger.info(f"📁 Log directory created/confirmed: {log_directory}")
-    logger.info(f"📄 Log file: {log_filename}")
-    logger.info(f"📁 Configured base directory: {base_directory}")
-    logger.info(f"🏷️ Configured file prefixes: {list(file_configs.keys())}")
-    logger.info("=" * 80)
+    console_print("=" * 80)
+    console_print("🚀 Excel automation program started")
+    console_print(f"📁 Log directory created/confirmed: {log_directory}")
+    console_print(f"📄 Log file: {log_filename}")
+    console_print(f"📁 Configured base directory: {base_directory}")
+    console_print(f"🏷️ Configured file prefixes: {list(file_configs.keys())}")
+    console_print("=" * 80)
     return logger
 
 def console_print(message, level='info'):
-    if logger is None:
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        print(f"[{timestamp}] {message}")
-        return
     if message == "":
         message = " "
-    if level.lower() == 'info':
-        logger.info(message)
-    elif level.lower() == 'warning':
-        logger.warning(message)
-    elif level.lower() == 'error':
-        logger.error(message)
-    else:
-        logger.info(message)
+    log_message(logger or get_logger('updating'), message, level.upper(), style="timestamped")
+
+def create_excel_session():
+    # 一批檔案共用一個 Excel Application（見 excel_session.py）
+    # automation_backend: win32com（真正的 Excel）或 simulated（模擬 Excel，測試 / benchmark 用）
+    backend = create_backend(
+        advanced_settings.get("automation_backend", "win32com"),
+        visible=advanced_settings["excel_visible"],
+        simulated_settings=advanced_settings.get("simulated_excel")
+    )
+    return ExcelSession(
+        backend,
+        max_workbooks=advanced_settings.get("excel_session_max_workbooks", 20),
+        log=console_print
+    )
 
 def safe_execute(func, *args, **kwargs):
     max_retries = advanced_settings["max_retries"]
@@ -109,18 +112,17 @@ def get_file_last_save_time(file_path):
         return None
 
 def is_excel_file_accessible(file_path, open_password=None):
-    if open_password is not None:
-        console_print(f"File has password protection, skipping accessibility check")
-        return True
-    try:
-        wb = load_workbook(file_path, read_only=True, data_only=True)
-        wb.close()
-        return True
-    except Exception as e:
-        console_print(f"File '{file_path}' is not accessible: {str(e)}", level='error')
-        return False
+    # 只檢查 owner 檔、檔案鎖及 zip 結構，唔載入 workbook；讀到的 metadata 會 cache 俾之後使用
+    probe = probe_workbook(file_path, allow_encrypted=open_password is not None)
+    if probe.warning:
+        console_print(f"File '{file_path}': {probe.warning}", level='warning')
+    if probe.encrypted and probe.accessible:
+        console_print(f"File has password protection, skipping workbook structure check")
+    if not probe.accessible:
+        console_print(f"File '{file_path}' is not accessible: {probe.reason}", level='error')
+    return probe.accessible
 
-def get_last_save_author_improved(file_path, has_password=False, open_password=None, workbook_obj=None):
+def get_last_save_author_improved(file_path, has_password=False, open_password=None, workbook_obj=None, session=None):
     # Method 1: If workbook object is provided, get author from opened workbook
     if workbook_obj is not None:
         try:
@@ -129,24 +131,18 @@ def get_last_save_author_improved(file_path, has_password=False, open_password=N
             return last_author if last_author else "Last author info not found from opened workbook"
         except Exception as e:
             console_print(f"Cannot get author info from opened workbook: {str(e)}", level='warning')
-    # Method 2: For password-protected files, use win32com to open directly and extract
+    # Method 2: Read docProps/core.xml straight from the xlsx/xlsm zip (no Excel, no full workbook load)
+    metadata = read_workbook_metadata(file_path)
+    if metadata is not None:
+        return metadata.last_author if metadata.last_author else "Last author info not found in document properties"
+    # Method 3: Encrypted (password-protected) files are not zip files, use win32com to open directly and extract
     if has_password and open_password is not None:
-        excel_app = None
+        owns_session = session is None
+        session = session or create_excel_session()
         workbook = None
         try:
             console_print(f"Using win32com to open password-protected file for metadata extraction...")
-            excel_app = win32.Dispatch("Excel.Application")
-            excel_app.Visible = False
-            excel_app.DisplayAlerts = False
-            excel_app.EnableEvents = False
-            open_params = {
-                'Filename': file_path,
-                'Password': open_password,
-                'ReadOnly': True,
-                'UpdateLinks': False,
-                'IgnoreReadOnlyRecommended': True
-            }
-            workbook = excel_app.Workbooks.Open(**open_params)
+            workbook = session.open_read_only(file_path, open_password)
             builtin_props = workbook.BuiltinDocumentProperties
             last_author = builtin_props("Last Author").Value
             return last_author if last_author else "Last author info not found in password-protected file"
@@ -156,50 +152,25 @@ def get_last_save_author_improved(file_path, has_password=False, open_password=N
         finally:
             if workbook:
                 try:
-                    workbook.Close(SaveChanges=False)
-                except:
-                    pass
-            if excel_app:
-                try:
-                    excel_app.Quit()
+                    session.close_workbook(workbook)
                 except:
                     pass
-    # Method 3: Use openpyxl for files without password
-    if not has_password:
-        try:
-            wb = load_workbook(file_path, read_only=True, data_only=True)
-            last_author = wb.properties.lastModifiedBy
-            wb.close()
-            return last_author if last_author else "Last author info not found from openpyxl"
-        except Exception as e:
-            console_print(f"Cannot get author info via openpyxl: {str(e)}", level='warning')
+            if owns_session:
+                session.close()
     # Default
     if has_password:
-        return "Password-protected file, openpyxl cannot get author info"
+        return "Password-protected file, cannot get author info without open password"
     else:
         return "Cannot get author info"
 
-def get_workbook_metadata_via_win32com(file_path, open_password=None, write_password=None):
-    excel_app = None
+def get_workbook_metadata_via_win32com(file_path, open_password=None, write_password=None, session=None):
+    owns_session = session is None
+    session = session or create_excel_session()
     workbook = None
     metadata = {}
     try:
         console_print(f"Using win32com to extract file metadata...")
-        excel_app = win32.Dispatch("Excel.Application")
-        excel_app.Visible = False
-        excel_app.DisplayAlerts = False
-        excel_app.EnableEvents = False
-        open_params = {
-            'Filename': file_path,
-            'ReadOnly': True,
-            'UpdateLinks': False,
-            'IgnoreReadOnlyRecommended': True
-        }
-        if open_password:
-            open_params['Password'] = open_password
-        if write_password:
-            open_params['WriteResPassword'] = write_password
-        workbook = excel_app.Workbooks.Open(**open_params)
+        workbook = session.open_read_only(file_path, open_password, write_password)
         builtin_props = workbook.BuiltinDocumentProperties
         try:
             last_author = builtin_props("Last Author").Value
@@ -226,20 +197,16 @@ def get_workbook_metadata_via_win32com(file_path, open_password=None, write_pass
     finally:
         if workbook:
             try:
-                workbook.Close(SaveChanges=False)
+                session.close_workbook(workbook)
             except Exception as e:
                 console_print(f"Error occurred while closing workbook: {str(e)}", level='warning')
-        if excel_app:
-            try:
-                excel_app.EnableEvents = True
-                excel_app.Quit()
-            except Exception as e:
-                console_print(f"Error occurred while closing Excel application: {str(e)}", level='warning')
+        if owns_session:
+            session.close()
 
 def refresh_workbook_connections(workbook):
     refresh_count = 0
     try:
-        excel_links = workbook.LinkSources(Type=win32.constants.xlExcelLinks)
+        excel_links = workbook.LinkSources(Type=XL_EXCEL_LINKS)
         if excel_links:
             console_print(f"📊 Found {len(excel_links)} Excel file links")
             for i, link_path in enumerate(excel_links):
@@ -248,13 +215,16 @@ def refresh_workbook_connections(workbook):
                 console_print(f"  └─ Link {i+1}: {link_file_name}")
                 console_print(f"     📁 Path: {link_dir}")
                 if os.path.exists(link_path):
-                    link_author = get_last_save_author_improved(link_path, False)
-                    link_last_save_time = get_file_last_save_time(link_path)
+                    # 同一個來源檔喺今次 batch 只讀一次
+                    link_author, link_last_save_time = link_source_cache.lookup(
+                        link_path,
+                        lambda: (get_last_save_author_improved(link_path, False), get_file_last_save_time(link_path))
+                    )
                     console_print(f"     👤 Last author: {link_author}")
                     console_print(f"     🕒 Last save time: {link_last_save_time}")
                     try:
                         console_print(f"     🔄 Updating link...")
-                        workbook.UpdateLink(Name=link_path, Type=win32.constants.xlExcelLinks)
+                        workbook.UpdateLink(Name=link_path, Type=XL_EXCEL_LINKS)
                         console_print(f"     ✅ Link update successful: {link_file_name}")
                         refresh_count += 1
                     except Exception as e:
@@ -300,7 +270,7 @@ def execute_macro_safely(excel_app, macro_name):
         console_print(f"   ❌ Macro execution failed: {str(e)}", level='error')
         return False
 
-def automate_excel_refresh_links(excel_file_path, file_config):
+def automate_excel_refresh_links(excel_file_path, file_config, session=None):
     macro_to_run = file_config.get("macro")
     file_open_password = file_config.get("open_password")
     file_write_password = file_config.get("write_password")
@@ -314,19 +284,23 @@ def automate_excel_refresh_links(excel_file_path, file_config):
     if not is_excel_file_accessible(excel_file_path, file_open_password):
         console_print(f"❌ File is not accessible, skipping processing: {file_name}", level='error')
         return False
-    excel_app = None
+    # 未有傳入 session（單獨處理一個檔案）就自己開一個，處理完即關閉
+    owns_session = session is None
+    session = session or create_excel_session()
     workbook = None
     success = False
     has_password = file_open_password is not None
     metadata_before = {}
     metadata_after = {}
     try:
-        if has_password:
+        if has_password and read_workbook_metadata(excel_file_path) is None:
+            # 加密檔案先要經 Excel 讀取 metadata；其他檔案直接讀 docProps/core.xml
             console_print("📋 Getting metadata for password-protected file before processing...")
             metadata_before = get_workbook_metadata_via_win32com(
                 excel_file_path,
                 file_open_password,
-                file_write_password
+                file_write_password,
+                session=session
             )
         else:
             console_print("📋 Getting file metadata before processing...")
@@ -343,25 +317,19 @@ def automate_excel_refresh_links(excel_file_path, file_config):
             console_print(f"   🕒 Last save time before processing: {last_save_time_before}")
             console_print(f"   👤 Last author before processing: {last_author_before}")
         console_print("")
-        console_print("🚀 Starting Excel application for processing...")
-        excel_app = win32.Dispatch("Excel.Application")
-        excel_app.Visible = advanced_settings["excel_visible"]
-        excel_app.DisplayAlerts = False
-        excel_app.EnableEvents = False
-        console_print("   ✅ Excel application startup completed")
+        excel_app = session.get_application()
         console_print(f"📂 Opening file for processing: {file_name}")
         open_params = {
-            'Filename': excel_file_path,
             'UpdateLinks': 3,
             'ReadOnly': False,
             'IgnoreReadOnlyRecommended': True,
-            'Origin': win32.constants.xlWindows
+            'Origin': XL_WINDOWS
         }
         if file_open_password:
             open_params['Password'] = file_open_password
         if file_write_password:
             open_params['WriteResPassword'] = file_write_password
-        workbook = safe_execute(excel_app.Workbooks.Open, **open_params)
+        workbook = safe_execute(session.open_workbook, excel_file_path, **open_params)
         console_print(f"   ✅ File opened successfully for processing")
         console_print("")
         console_print("🔄 Starting to refresh all external links and data connections...")
@@ -423,23 +391,22 @@ def automate_excel_refresh_links(excel_file_path, file_config):
     finally:
         if workbook:
             try:
-                workbook.Close(SaveChanges=False)
+                session.close_workbook(workbook)
                 console_print("🔐 Workbook closed")
             except Exception as e:
                 console_print(f"⚠️ Error occurred while closing workbook: {str(e)}", level='warning')
-        if excel_app:
-            try:
-                excel_app.EnableEvents = True
-                excel_app.Quit()
-                console_print("🔐 Excel application closed")
-            except Exception as e:
-                console_print(f"⚠️ Error occurred while closing Excel application: {str(e)}", level='warning')
+                success = False
+        # 出錯後 Excel 可能處於不穩定狀態，下一個檔案會用新的 Excel application
+        session.finish_workbook(failed=not success)
+        if owns_session:
+            session.close()
     status_icon = "✅" if success else "❌"
     console_print(f"{status_icon} File '{file_name}' processing {'successful' if success else 'failed'}")
     console_print("=" * 60)
     return success
 
-def process_excel_files_in_directory(base_directory, file_configs):
+def process_excel_files_in_directory(base_directory, file_configs, force=False):
+    # force: 唔理 refresh ledger，所有 workbook 都更新
     console_print("")
     console_print(f"🚀 Starting batch processing directory: {base_directory}")
     console_print(f"⏰ Processing start time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -450,11 +417,14 @@ def process_excel_files_in_directory(base_directory, file_configs):
     processed_files = []
     failed_files = []
     skipped_files = []
+    up_to_date_files = []
     all_excel_files = [f for f in os.listdir(base_directory)
                       if f.lower().endswith(('.xlsx', '.xlsm')) and
                       os.path.isfile(os.path.join(base_directory, f))]
     console_print(f"📊 Found {len(all_excel_files)} Excel files in directory")
     console_print("")
+    link_source_cache.clear()
+    jobs = []  # (filename, prefix)
     for prefix in file_configs.keys():
         console_print(f"🔍 Searching for files with prefix: {prefix}")
         matched_files = [f for f in all_excel_files if f.startswith(prefix)]
@@ -463,13 +433,87 @@ def process_excel_files_in_directory(base_directory, file_configs):
             skipped_files.append(f"No files for prefix: {prefix}")
             continue
         for filename in matched_files:
-            full_file_path = os.path.join(base_directory, filename)
             console_print(f"🎯 Found matching file: {filename} (prefix: '{prefix}')")
-            current_file_config = file_configs[prefix]
-            if automate_excel_refresh_links(full_file_path, current_file_config):
-                processed_files.append(filename)
+            jobs.append((filename, prefix))
+    # 按 workbook 之間的外部連結（及 depends_on）排成先後次序的 wave，來源檔先更新
+    wave_indexes, cyclic, links = build_refresh_waves(jobs, file_configs, base_directory)
+    for index, sources in links.items():
+        if sources:
+            console_print(f"🔗 {jobs[index][0]} links to: {', '.join(jobs[source][0] for source in sources)}")
+    if cyclic:
+        console_print(f"⚠️ Circular links between workbooks, processing them in config order: "
+                      f"{', '.join(jobs[index][0] for index in cyclic)}", level='warning')
+    waves = [[jobs[index] for index in wave] for wave in wave_indexes]
+    if len(waves) > 1:
+        console_print(f"📋 Refresh order: {len(waves)} wave(s), " + " → ".join(
+            "[" + ", ".join(filename for filename, _ in wave_jobs) + "]" for wave_jobs in waves))
+
+    # 增量更新：輸入檔案自上次成功更新後都冇變的 workbook 唔使再開
+    ledger = None
+    # 預設關閉：ledger 只比較連結來源檔及 depends_on 的檔案，其他輸入改變咗都可能被略過
+    if advanced_settings.get("incremental_refresh", False):
+        ledger = RefreshLedger(advanced_settings.get("refresh_ledger") or os.path.join(log_directory, "refresh_ledger.json"))
+        if force:
+            console_print("🔁 Force refresh requested, ignoring refresh ledger")
+
+    def depends_on_paths(prefix):
+        depends_on = (file_configs[prefix] or {}).get("depends_on") or []
+        return [os.path.join(base_directory, filename) for filename, job_prefix in jobs if job_prefix in depends_on]
+
+    max_parallel_workbooks = advanced_settings.get("max_parallel_workbooks", 1)
+    parallel = max_parallel_workbooks > 1 and any(len(wave_jobs) > 1 for wave_jobs in waves)
+    if parallel:
+        # 並行模式：每個 worker process 有自己獨立的 Excel instance
+        worker_count = min(max_parallel_workbooks, max(len(wave_jobs) for wave_jobs in waves))
+        console_print(f"⚡ Refreshing up to {worker_count} workbooks in parallel ({len(waves)} wave(s))")
+        runner = WorkbookPool(os.path.abspath(__file__), worker_count, base_directory)
+    else:
+        # 整批檔案共用一個 Excel application，出錯後或處理一定數量後先重新啟動
+        runner = create_excel_session()
+    with runner:
+        for wave_jobs in waves:
+            pending_jobs = []
+            for filename, prefix in wave_jobs:
+                if ledger is not None and not force:
+                    up_to_date, reason = ledger.check(os.path.join(base_directory, filename), file_configs[prefix], depends_on_paths(prefix))
+                    if up_to_date:
+                        console_print(f"✔️ {filename} is up to date ({reason}), skipping refresh")
+                        up_to_date_files.append(filename)
+                        continue
+                    console_print(f"🔄 {filename} needs refresh: {reason}")
+                pending_jobs.append((filename, prefix))
+            if not pending_jobs:
+                continue
+            if parallel:
+                results = []
+                wave_results = runner.run_wave([(os.path.join(base_directory, filename), file_configs[prefix])
+                                                for filename, prefix in pending_jobs], link_source_cache)
+                for success, records in wave_results:
+                    for message, message_type in records:
+                        console_print(message, level=message_type.lower())
+                    results.append(success)
             else:
-                failed_files.append(filename)
+                results = [automate_excel_refresh_links(os.path.join(base_directory, filename), file_configs[prefix], runner)
+                           for filename, prefix in pending_jobs]
+            for (filename, prefix), success in zip(pending_jobs, results):
+                (processed_files if success else failed_files).append(filename)
+                if ledger is not None:
+                    file_path = os.path.join(base_directory, filename)
+                    if success:
+                        ledger.record(file_path, file_configs[prefix], depends_on_paths(prefix))
+                    else:
+                        ledger.forget(file_path)
+            if ledger is not None:
+                try:
+                    ledger.save()
+                except OSError as e:
+                    console_print(f"Cannot save refresh ledger {ledger.path}: {str(e)}", level='warning')
+    if parallel:
+        console_print(f"🚀 Excel application started in {len(runner.worker_pids)} worker process(es) for this batch")
+    else:
+        console_print(f"🚀 Excel application started {runner.starts} time(s) for this batch")
+    if link_source_cache.reads or link_source_cache.hits:
+        console_print(f"🔗 Linked source metadata read {link_source_cache.reads} time(s), reused {link_source_cache.hits} time(s)")
     for filename in all_excel_files:
         if not any(filename in processed_files or filename in failed_files for filename in all_excel_files):
             console_print(f"⏭️ Skipping file (no matching prefix): {filename}")
@@ -479,6 +523,7 @@ def process_excel_files_in_directory(base_directory, file_configs):
     console_print("📊 Batch processing completion summary:")
     console_print(f"   ✅ Successfully processed: {len(processed_files)} files")
     console_print(f"   ❌ Processing failed: {len(failed_files)} files")
+    console_print(f"   ✔️ Up to date (inputs unchanged): {len(up_to_date_files)} files")
     console_print(f"   ⏭️ Skipped files: {len(skipped_files)} files")
     console_print("")
     if processed_files:
@@ -491,6 +536,11 @@ def process_excel_files_in_directory(base_directory, file_configs):
         for file in failed_files:
             console_print(f"   • {file}")
         console_print("")
+    if up_to_date_files:
+        console_print("✔️ Up to date files:")
+        for file in up_to_date_files:
+            console_print(f"   • {file}")
+        console_print("")
     if skipped_files:
         console_print("⏭️ Skipped files:")
         for file in skipped_files:
@@ -498,10 +548,18 @@ def process_excel_files_in_directory(base_directory, file_configs):
         console_print("")
     console_print(f"⏰ Processing end time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     console_print("=" * 70)
+    return {
+        "processed": processed_files,
+        "failed": failed_files,
+        "up_to_date": up_to_date_files,
+        "skipped": skipped_files,
+    }
 
-def validate_configuration():
+def validate_configuration(base_directory):
     errors = []
-    if not os.path.exists(base_directory):
+    if not base_directory:
+        errors.append("No base directory specified (pass it from the monitor or set base_directory in the config)")
+    elif not os.path.exists(base_directory):
         errors.append(f"Base directory does not exist: {base_directory}")
     if not file_configs:
         errors.append("No file configurations specified")
@@ -509,21 +567,27 @@ def validate_configuration():
         errors.append("max_retries must be at least 1")
     if advanced_settings["retry_delay_base"] < 1:
         errors.append("retry_delay_base must be at least 1")
+    if advanced_settings.get("automation_backend", "win32com") not in AUTOMATION_BACKENDS:
+        errors.append(f"automation_backend must be one of {', '.join(AUTOMATION_BACKENDS)}")
     return errors
 
-def main():
+def main(base_directory=None, force=False):
+    # base_directory: 由 monitoring 的常駐 worker 傳入，未提供則用 config（或 BASE_DIRECTORY_FROM_MONITOR）
+    # force: 略過 refresh ledger，所有 workbook 都重新更新（命令列用 --force）
     global logger
     log_filepath = None
+    if base_directory is None:
+        base_directory = os.environ.get("BASE_DIRECTORY_FROM_MONITOR") or updating_config.get("base_directory")
     try:
-        config_errors = validate_configuration()
+        config_errors = validate_configuration(base_directory)
         if config_errors:
             print("❌ Configuration errors found:")
             for error in config_errors:
                 print(f"   • {error}")
             return 1
-        logger = setup_logging()
+        logger = setup_logging(base_directory)
         log_filepath = os.environ.get("log_filepath")
-        process_excel_files_in_directory(base_directory, file_configs)
+        process_excel_files_in_directory(base_directory, file_configs, force=force)
         console_print("")
         console_print("🎉 Program execution completed")
         console_print("=" * 80)
@@ -537,6 +601,7 @@ def main():
     finally:
         if logger and log_filepath and os.path.exists(log_filepath):
             console_print("Preparing to send notification email...")
+            flush_logging()
             content = ""
             try:
                 with open(log_filepath, 'r', encoding='utf-8') as f:
@@ -551,18 +616,25 @@ This is an automated notification.
 Best regards,
 Your Automation Script
 """
-            send_outlook_email(
-                to_recipients=to_recipients,
-                subject=f"{email_subject} ({time.strftime('%Y-%m-%d %H:%M:%S')})",
-                body=email_body,
-                cc_recipients=cc_recipients,
-                bcc_recipients=bcc_recipients
-            )
-            console_print("📄 Notification email sent.")
+            # Outlook 電郵需要 win32com，用 simulated 後端（冇 Excel / Outlook 的環境）時可能載入唔到
+            try:
+                from utility.send_outlook_email import send_outlook_email
+            except ImportError as e:
+                console_print(f"⚠️ Outlook email utility not available, notification email not sent: {str(e)}", level='warning')
+            else:
+                send_outlook_email(
+                    to_recipients=to_recipients,
+                    subject=f"{email_subject} ({time.strftime('%Y-%m-%d %H:%M:%S')})",
+                    body=email_body,
+                    cc_recipients=cc_recipients,
+                    bcc_recipients=bcc_recipients
+                )
+                console_print("📄 Notification email sent.")
         elif not log_filepath:
             print("Log file path not found, cannot send email.")
         if logger:
             console_print("📄 Log file saved successfully")
+            set_log_file('updating', None)
 
 if __name__ == "__main__":
-    main()
+    main(force="--force" in sys.argv[1:])
@@ -0,0 +1,430 @@
+import os
+import sys
+import time
+import queue
+import select
+import struct
+import threading
+
+# --- Watcher 後端 ---
+# 每個 watcher 都提供同一組介面：
+#   add_folder(path) / remove_folder(path) / wait(timeout) / close()
+# wait() 會回傳 {folder_path: set(file_names) 或 None}，None 代表「需要整個資料夾重新掃描」。
+
+NETWORK_FS_TYPES = {"cifs", "smb", "smb2", "smb3", "smbfs", "nfs", "nfs4", "afs", "fuse.sshfs", "9p"}
+
+
+class WatcherError(Exception):
+    pass
+
+
+class PollingWatcher:
+    name = "polling"
+
+    def __init__(self):
+        self.folders = set()
+
+    def add_folder(self, folder_path):
+        self.folders.add(folder_path)
+
+    def remove_folder(self, folder_path):
+        self.folders.discard(folder_path)
+
+    def wait(self, timeout):
+        if timeout and timeout > 0:
+            time.sleep(timeout)
+        return {folder_path: None for folder_path in self.folders}
+
+    def close(self):
+        self.folders.clear()
+
+
+class InotifyWatcher:
+    name = "inotify"
+    supports_recursive = False  # inotify 只監控單一資料夾，recursive 資料夾改用 polling
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+                  IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+    EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self, settle_time=0.1):
+        import ctypes
+        import ctypes.util
+        self._ctypes = ctypes
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise WatcherError(f"inotify_init1 failed: {os.strerror(ctypes.get_errno())}")
+        self.settle_time = settle_time
+        self.folders = {}
+        self._wd_to_folder = {}
+
+    @staticmethod
+    def is_supported():
+        return sys.platform.startswith("linux")
+
+    def add_folder(self, folder_path, recursive=False):
+        if recursive:
+            raise WatcherError(f"inotify cannot watch {folder_path} recursively")
+        if folder_path in self.folders:
+            return
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(folder_path), self.WATCH_MASK)
+        if wd < 0:
+            raise WatcherError(f"Cannot watch {folder_path}: {os.strerror(self._ctypes.get_errno())}")
+        self.folders[folder_path] = wd
+        self._wd_to_folder[wd] = folder_path
+
+    def remove_folder(self, folder_path):
+        wd = self.folders.pop(folder_path, None)
+        if wd is None:
+            return
+        self._wd_to_folder.pop(wd, None)
+        self._libc.inotify_rm_watch(self._fd, wd)
+
+    def _read_events(self, changes):
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + self.EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            raw_name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                # 事件佇列爆滿，所有資料夾都要重新掃描
+                for folder_path in self.folders:
+                    changes[folder_path] = None
+                continue
+            folder_path = self._wd_to_folder.get(wd)
+            if folder_path is None:
+                continue
+            if mask & (self.IN_DELETE_SELF | self.IN_MOVE_SELF | self.IN_IGNORED):
+                changes[folder_path] = None
+                if mask & self.IN_IGNORED:
+                    self.folders.pop(folder_path, None)
+                    self._wd_to_folder.pop(wd, None)
+                continue
+            if folder_path in changes and changes[folder_path] is None:
+                continue
+            changes.setdefault(folder_path, set())
+            if raw_name:
+                changes[folder_path].add(os.fsdecode(raw_name))
+
+    def wait(self, timeout):
+        changes = {}
+        readable, _, _ = select.select([self._fd], [], [], max(timeout, 0))
+        if not readable:
+            return changes
+        self._read_events(changes)
+        # Excel 存檔會連續產生多個事件，稍等一下合併成一批
+        deadline = time.monotonic() + self.settle_time
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select([self._fd], [], [], remaining)
+            if not readable:
+                break
+            self._read_events(changes)
+        return changes
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+        self.folders.clear()
+        self._wd_to_folder.clear()
+
+
+class ReadDirectoryChangesWatcher:
+    name = "windows"
+    supports_recursive = True
+
+    def __init__(self, settle_time=0.1):
+        import win32con
+        import win32file
+        self._win32con = win32con
+        self._win32file = win32file
+        self.settle_time = settle_time
+        self.folders = {}
+        self._events = queue.Queue()
+
+    @staticmethod
+    def is_supported():
+        if not sys.platform.startswith("win"):
+            return False
+        try:
+            import win32file  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def add_folder(self, folder_path, recursive=False):
+        if folder_path in self.folders:
+            return
+        win32con = self._win32con
+        win32file = self._win32file
+        try:
+            handle = win32file.CreateFile(
+                folder_path,
+                0x0001,  # FILE_LIST_DIRECTORY
+                win32con.FILE_SHARE_READ | win32con.FILE_SHARE_WRITE | win32con.FILE_SHARE_DELETE,
+                None,
+                win32con.OPEN_EXISTING,
+                win32con.FILE_FLAG_BACKUP_SEMANTICS,
+                None
+            )
+        except Exception as e:
+            raise WatcherError(f"Cannot watch {folder_path}: {e}")
+        stop_event = threading.Event()
+        thread = threading.Thread(
+            target=self._watch_folder,
+            args=(folder_path, handle, stop_event, recursive),
+            name=f"watch:{folder_path}",
+            daemon=True
+        )
+        self.folders[folder_path] = (handle, stop_event, thread)
+        thread.start()
+
+    def _watch_folder(self, folder_path, handle, stop_event, recursive=False):
+        win32con = self._win32con
+        win32file = self._win32file
+        flags = (win32con.FILE_NOTIFY_CHANGE_FILE_NAME |
+                 win32con.FILE_NOTIFY_CHANGE_LAST_WRITE |
+                 win32con.FILE_NOTIFY_CHANGE_SIZE)
+        if recursive:
+            flags |= win32con.FILE_NOTIFY_CHANGE_DIR_NAME
+        while not stop_event.is_set():
+            try:
+                results = win32file.ReadDirectoryChangesW(handle, 64 * 1024, recursive, flags, None, None)
+            except Exception:
+                if not stop_event.is_set():
+                    self._events.put((folder_path, None))
+                return
+            if not results:
+                # buffer 爆滿時 Windows 會回傳空結果，整個資料夾重新掃描
+                self._events.put((folder_path, None))
+                continue
+            for _action, file_name in results:
+                self._events.put((folder_path, file_name))
+
+    def remove_folder(self, folder_path):
+        entry = self.folders.pop(folder_path, None)
+        if entry is None:
+            return
+        handle, stop_event, _thread = entry
+        stop_event.set()
+        try:
+            handle.Close()
+        except Exception:
+            pass
+
+    def _drain(self, changes, timeout):
+        try:
+            folder_path, file_name = self._events.get(timeout=timeout) if timeout else self._events.get_nowait()
+        except queue.Empty:
+            return False
+        if file_name is None:
+            changes[folder_path] = None
+        elif changes.get(folder_path, set()) is not None:
+            changes.setdefault(folder_path, set()).add(file_name)
+        return True
+
+    def wait(self, timeout):
+        changes = {}
+        if not self._drain(changes, max(timeout, 0.001)):
+            return changes
+        deadline = time.monotonic() + self.settle_time
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._drain(changes, remaining):
+                break
+        return changes
+
+    def close(self):
+        for folder_path in list(self.folders):
+            self.remove_folder(folder_path)
+
+
+NATIVE_WATCHERS = [InotifyWatcher, ReadDirectoryChangesWatcher]
+
+
+def is_network_path(folder_path):
+    if sys.platform.startswith("win"):
+        if folder_path.startswith("\\\\"):
+            return True
+        try:
+            import win32file
+            drive = os.path.splitdrive(os.path.abspath(folder_path))[0] + "\\"
+            return win32file.GetDriveType(drive) == win32file.DRIVE_REMOTE
+        except Exception:
+            return False
+    try:
+        real_path = os.path.realpath(folder_path)
+        best_mount, best_type = "", ""
+        with open("/proc/mounts", "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 3:
+                    continue
+                mount_point = parts[1].replace("\\040", " ")
+                if (real_path == mount_point or real_path.startswith(mount_point.rstrip("/") + "/")) \
+                        and len(mount_point) > len(best_mount):
+                    best_mount, best_type = mount_point, parts[2]
+        return best_type in NETWORK_FS_TYPES
+    except OSError:
+        return False
+
+
+def create_native_watcher():
+    for watcher_class in NATIVE_WATCHERS:
+        if watcher_class.is_supported():
+            try:
+                return watcher_class()
+            except Exception:
+                continue
+    return None
+
+
+# 每個資料夾優先用原生通知（inotify / ReadDirectoryChangesW），原生後端不能監控的資料夾就用 polling 後備。
+# network share（例如 K:\\）未必會送出通知，所以 auto 模式下先試用原生通知，試用期間同時 polling：
+#   - 收到事件而掃描亦發現改變，即確認可用，停止 polling
+#   - 連續 MAX_MISSED_EVENTS 次掃描發現改變但冇收到事件，即改用 polling
+#   - 試用期（probation_period）內冇任何改變亦停止 polling，之後靠定期重新掃描（rescan_interval）發現漏收事件
+# polling 資料夾幾時掃描由 monitoring 的 PollSchedule 決定，wait() 只回傳原生事件。
+MAX_MISSED_EVENTS = 2
+
+
+class FolderWatcher:
+    def __init__(self, default_backend="auto", rescan_interval=300, probation_period=600):
+        self.default_backend = default_backend
+        self.rescan_interval = rescan_interval
+        self.probation_period = probation_period
+        self.native = None
+        self.polling = PollingWatcher()
+        self.backends = {}
+        self.probation = {}  # folder_path -> 開始試用原生通知的時間（network share）
+        self._native_events = set()  # 上次掃描之後收到原生事件的資料夾
+        self._missed_events = {}  # folder_path -> 連續幾多次掃描發現改變但冇收到事件
+        self._scanned = set()
+        self._last_rescan = time.monotonic()
+        if default_backend != "polling":
+            self.native = create_native_watcher()
+
+    def add_folder(self, folder_path, backend=None, recursive=False):
+        backend = backend or self.default_backend
+        if recursive and not getattr(self.native, "supports_recursive", False):
+            backend = "polling"
+        if backend != "polling" and self.native is not None \
+                and backend in ("auto", "native", self.native.name):
+            try:
+                self.native.add_folder(folder_path, recursive=recursive)
+                self.backends[folder_path] = self.native.name
+                if backend == "auto" and is_network_path(folder_path):
+                    self.probation[folder_path] = time.monotonic()
+                    self.polling.add_folder(folder_path)
+                return self.native.name
+            except WatcherError:
+                pass
+        self.polling.add_folder(folder_path)
+        self.backends[folder_path] = self.polling.name
+        return self.polling.name
+
+    def remove_folder(self, folder_path):
+        self.probation.pop(folder_path, None)
+        self._native_events.discard(folder_path)
+        self._missed_events.pop(folder_path, None)
+        self._scanned.discard(folder_path)
+        if self.backends.pop(folder_path, None) is None:
+            return
+        self.polling.remove_folder(folder_path)
+        if self.native is not None:
+            self.native.remove_folder(folder_path)
+
+    def polled_folders(self):
+        return set(self.polling.folders)
+
+    def _use_polling(self, folder_path):
+        if self.native is not None:
+            self.native.remove_folder(folder_path)
+        self.probation.pop(folder_path, None)
+        self._missed_events.pop(folder_path, None)
+        self.polling.add_folder(folder_path)
+        self.backends[folder_path] = self.polling.name
+
+    def record_scan(self, folder_path, changed):
+        # monitoring 每次掃描後呼叫；原生通知收唔到事件而要改用 polling 時回傳 True
+        if self.native is None or self.backends.get(folder_path) != self.native.name:
+            return False
+        had_events = folder_path in self._native_events
+        self._native_events.discard(folder_path)
+        if folder_path not in self._scanned:
+            # 第一次掃描係同舊 snapshot 比較，唔計
+            self._scanned.add(folder_path)
+            return False
+        if had_events:
+            # 收到原生事件即代表通知有效，之前 polling 先發現的變更唔再計（事件可能遲過掃描先到）
+            self._missed_events.pop(folder_path, None)
+        if not changed:
+            return False
+        if had_events:
+            if self.probation.pop(folder_path, None) is not None:
+                self.polling.remove_folder(folder_path)
+            return False
+        # 掃描同事件可能差少少時間，連續幾次都收唔到事件先改用 polling
+        self._missed_events[folder_path] = self._missed_events.get(folder_path, 0) + 1
+        if self._missed_events[folder_path] < MAX_MISSED_EVENTS:
+            return False
+        self._use_polling(folder_path)
+        return True
+
+    def wait(self, timeout):
+        if self.native is not None and self.native.folders:
+            changes = self.native.wait(timeout)
+        else:
+            changes = {}
+            if timeout > 0:
+                time.sleep(timeout)
+        self._native_events.update(changes)
+        if self.native is not None:
+            # 原生後端失去監控（如資料夾被刪除或改名）就改用 polling
+            for folder_path, backend in list(self.backends.items()):
+                if backend == self.native.name and folder_path not in self.native.folders:
+                    self._use_polling(folder_path)
+                    changes[folder_path] = None
+            # 試用期內冇任何改變的 network share 停止 polling
+            now = time.monotonic()
+            for folder_path, started in list(self.probation.items()):
+                if now - started >= self.probation_period:
+                    del self.probation[folder_path]
+                    self.polling.remove_folder(folder_path)
+            # 定期全面重新掃描，以防漏收事件
+            if self.rescan_interval and time.monotonic() - self._last_rescan >= self.rescan_interval:
+                self._last_rescan = time.monotonic()
+                for folder_path in self.native.folders:
+                    changes[folder_path] = None
+        return changes
+
+    def close(self):
+        self.polling.close()
+        if self.native is not None:
+            self.native.close()
+        self.backends.clear()
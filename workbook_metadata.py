@@ -0,0 +1,228 @@
+import os
+import zipfile
+import threading
+from collections import namedtuple
+from datetime import datetime
+from xml.etree import ElementTree
+
+# --- 唔使開 Excel 讀取 workbook metadata ---
+# xlsx / xlsm 係 zip 檔，最後修改者及儲存時間記錄喺 docProps/core.xml（通常只有幾百 bytes），
+# 只需讀 zip 的 central directory 及呢一個 part，唔使載入整個 workbook 或啟動 Excel。
+# 結果按 (path, size, mtime) cache，檔案冇變就唔會再讀。
+# 加密（有開啟密碼）的檔案唔係 zip 格式，回傳 None，由呼叫者改用 Excel 讀取。
+#
+# probe_workbook() 喺交俾 Excel 之前快速檢查檔案可唔可以處理（唔解析任何 worksheet）：
+#   1. 可唔可以用寫入模式開啟（Windows 上被 Excel 或其他程式開住會失敗）
+#   2. zip central directory 完整，並有 [Content_Types].xml 及 xl/workbook.xml
+# Office owner 檔（~$檔名）只作參考：Excel crash 後會留低，所以只喺開唔到檔案時用嚟講明邊個開住，
+# 可以開啟的話只回傳 warning。
+# 檢查時順便讀取 docProps/core.xml 放入 cache，之後讀 metadata 唔使再開檔。
+
+CORE_PROPERTIES_PART = "docProps/core.xml"
+NAMESPACES = {
+    "cp": "http://schemas.openxmlformats.org/package/2006/metadata/core-properties",
+    "dc": "http://purl.org/dc/elements/1.1/",
+    "dcterms": "http://purl.org/dc/terms/",
+}
+
+WorkbookMetadata = namedtuple("WorkbookMetadata", ["last_author", "creator", "modified", "created"])
+ProbeResult = namedtuple("ProbeResult", ["accessible", "reason", "encrypted", "metadata", "warning"], defaults=[None])
+
+REQUIRED_PARTS = ("[Content_Types].xml", "xl/workbook.xml")
+OLE_SIGNATURE = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"  # 加密的 Office 檔（compound file）
+
+
+def _parse_w3c_datetime(value):
+    # "2024-01-01T04:00:00Z"（UTC）→ 本地時間字串，同 Excel 的 Last Save Time 一樣
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return value
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone()
+    return parsed.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _core_properties_from_archive(archive):
+    try:
+        data = archive.read(CORE_PROPERTIES_PART)
+    except KeyError:
+        return WorkbookMetadata(None, None, None, None)
+    root = ElementTree.fromstring(data)
+
+    def text(tag):
+        element = root.find(tag, NAMESPACES)
+        return element.text.strip() if element is not None and element.text else None
+
+    return WorkbookMetadata(
+        last_author=text("cp:lastModifiedBy"),
+        creator=text("dc:creator"),
+        modified=_parse_w3c_datetime(text("dcterms:modified")),
+        created=_parse_w3c_datetime(text("dcterms:created")),
+    )
+
+
+def read_core_properties(file_path):
+    # 回傳 WorkbookMetadata；唔係 zip（例如加密檔案）回傳 None
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            return _core_properties_from_archive(archive)
+    except zipfile.BadZipFile:
+        return None
+
+
+class MetadataCache:
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._cache = {}  # file_path -> (size, mtime, metadata)
+        self.hits = 0
+        self.reads = 0
+
+    def get(self, file_path):
+        # 讀唔到（檔案唔存在、加密、內容損壞）回傳 None
+        try:
+            stat_result = os.stat(file_path)
+        except OSError:
+            return None
+        key = (stat_result.st_size, stat_result.st_mtime)
+        with self._lock:
+            cached = self._cache.get(file_path)
+            if cached is not None and cached[:2] == key:
+                self.hits += 1
+                return cached[2]
+        try:
+            metadata = read_core_properties(file_path)
+        except (OSError, ElementTree.ParseError, zipfile.LargeZipFile, NotImplementedError, RuntimeError):
+            metadata = None
+        with self._lock:
+            self.reads += 1
+            if len(self._cache) >= self.max_entries:
+                self._cache.clear()
+            self._cache[file_path] = key + (metadata,)
+        return metadata
+
+    def put(self, file_path, size, mtime, metadata):
+        with self._lock:
+            self._cache[file_path] = (size, mtime, metadata)
+
+    def forget(self, file_path):
+        with self._lock:
+            self._cache.pop(file_path, None)
+
+
+_metadata_cache = MetadataCache()
+
+
+def read_workbook_metadata(file_path):
+    return _metadata_cache.get(file_path)
+
+
+class LinkSourceCache:
+    # 一次更新（一個 batch）入面 linked source 的 metadata：幾多個 workbook 連結去同一個來源檔都只讀一次。
+    # 按 (path, size, mtime) 判斷，來源檔喺 batch 期間被更新就會重新讀取。
+    # 並行模式下由主 process 持有，每個 wave 傳俾 worker，worker 新讀取的結果再合併返嚟。
+    def __init__(self):
+        self._entries = {}  # file_path -> (size, mtime, value)
+        self._added = set()
+        self.hits = 0
+        self.reads = 0
+        self._exported = (0, 0)
+
+    def clear(self):
+        self._entries.clear()
+        self._added.clear()
+        self.hits = 0
+        self.reads = 0
+        self._exported = (0, 0)
+
+    def lookup(self, file_path, read):
+        # read(): 讀取 metadata 的函數，只喺 cache 冇（或檔案已改變）時呼叫
+        try:
+            stat_result = os.stat(file_path)
+        except OSError:
+            return read()
+        cached = self._entries.get(file_path)
+        if cached is not None and cached[:2] == (stat_result.st_size, stat_result.st_mtime):
+            self.hits += 1
+            return cached[2]
+        value = read()
+        self.reads += 1
+        self._entries[file_path] = (stat_result.st_size, stat_result.st_mtime, value)
+        self._added.add(file_path)
+        return value
+
+    def snapshot(self):
+        return dict(self._entries)
+
+    def export(self):
+        # 上次 export 之後新讀取的項目及 hits / reads 增加了幾多
+        added = {file_path: self._entries[file_path] for file_path in self._added if file_path in self._entries}
+        self._added.clear()
+        hits, reads = self.hits - self._exported[0], self.reads - self._exported[1]
+        self._exported = (self.hits, self.reads)
+        return added, hits, reads
+
+    def merge(self, entries, hits=0, reads=0):
+        self._entries.update(entries)
+        self.hits += hits
+        self.reads += reads
+
+
+def owner_file_path(file_path):
+    # Excel 開檔時喺同一資料夾建立 "~$" + 檔名
+    directory, file_name = os.path.split(file_path)
+    owner_path = os.path.join(directory, "~$" + file_name)
+    return owner_path if os.path.exists(owner_path) else None
+
+
+def read_owner_name(owner_path):
+    # owner 檔第一個 byte 係用戶名長度，之後係用戶名
+    try:
+        with open(owner_path, "rb") as f:
+            data = f.read(128)
+        length = data[0] if data else 0
+        return data[1:1 + length].decode("latin-1").strip() or None
+    except (OSError, IndexError):
+        return None
+
+
+def probe_workbook(file_path, allow_encrypted=False):
+    # allow_encrypted: 有開啟密碼的檔案唔係 zip，交俾 Excel 處理
+    owner_path = owner_file_path(file_path)
+    owner_note = None
+    if owner_path is not None:
+        owner = read_owner_name(owner_path)
+        owner_note = f"{os.path.basename(owner_path)} exists{f' (opened by {owner})' if owner else ''}"
+    try:
+        stat_result = os.stat(file_path)
+        fd = os.open(file_path, os.O_RDWR | getattr(os, "O_BINARY", 0))
+    except FileNotFoundError:
+        return ProbeResult(False, "File does not exist", False, None)
+    except OSError as e:
+        if owner_note:
+            return ProbeResult(False, f"File is open in Excel: {owner_note}", False, None)
+        return ProbeResult(False, f"File is locked by another process: {e.strerror or e}", False, None)
+    # 開到檔案即係冇人鎖住，owner 檔多數係 Excel crash 後留低
+    warning = f"{owner_note}, but the file is not locked (stale Excel owner file?)" if owner_note else None
+    try:
+        with os.fdopen(fd, "rb") as f:
+            if f.read(len(OLE_SIGNATURE)) == OLE_SIGNATURE:
+                if allow_encrypted:
+                    return ProbeResult(True, None, True, None, warning)
+                return ProbeResult(False, "File is encrypted but no open password is configured", True, None)
+            f.seek(0)
+            with zipfile.ZipFile(f) as archive:
+                names = set(archive.namelist())
+                missing = [part for part in REQUIRED_PARTS if part not in names]
+                if missing:
+                    return ProbeResult(False, f"Workbook is incomplete, missing {', '.join(missing)}", False, None)
+                metadata = _core_properties_from_archive(archive)
+    except zipfile.BadZipFile as e:
+        return ProbeResult(False, f"Workbook is damaged or still being written: {e}", False, None)
+    except (OSError, ElementTree.ParseError) as e:
+        return ProbeResult(False, str(e), False, None)
+    _metadata_cache.put(file_path, stat_result.st_size, stat_result.st_mtime, metadata)
+    return ProbeResult(True, None, False, metadata, warning)
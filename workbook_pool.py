@@ -0,0 +1,110 @@
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import util
+
+from log_pipeline import get_pipeline, get_logger
+from update_worker import load_update_module
+
+# --- 多個 Excel instance 並行更新 workbook ---
+# 每個 worker process 載入更新腳本一次，並擁有自己獨立的 Excel session（見 excel_session.py），
+# 之後重複處理分配到的 workbook。有依賴關係的 workbook 分成先後幾個 wave（見 link_graph.py），
+# 同一個 wave 入面的 workbook 先會並行處理。
+# 更新腳本需要提供 create_excel_session() 及 automate_excel_refresh_links(path, config, session)。
+# worker 的訊息會收集起來，由主 process 按檔案逐個輸出（寫入同一個 log 檔）。
+# 更新腳本如有 link_source_cache（LinkSourceCache），各 worker 讀到的 linked source metadata 會喺每個 wave 之後合併。
+
+_worker = {}  # 每個 worker process 一份：module、session
+
+
+class _CapturedLog(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append((record.getMessage(), getattr(record, "message_type", record.levelname)))
+
+
+def _init_worker(updating_script_path, base_directory=None):
+    # worker 唔直接輸出到 console，訊息交返俾主 process
+    get_pipeline().detach()
+    # 資料夾路徑由主 process 傳入，唔依賴更新腳本 import 時讀取的 config
+    if base_directory:
+        os.environ["BASE_DIRECTORY_FROM_MONITOR"] = base_directory
+    module = load_update_module(updating_script_path)
+    session = module.create_excel_session()
+    util.Finalize(session, session.close, exitpriority=10)
+    _worker.update(module=module, session=session)
+
+
+def _refresh_in_worker(excel_file_path, file_config, link_sources=None):
+    capture = _CapturedLog()
+    logger = get_logger("updating")
+    logger.addHandler(capture)
+    link_cache = getattr(_worker["module"], "link_source_cache", None)
+    if link_cache is not None and link_sources:
+        link_cache.merge(link_sources)
+    try:
+        success = _worker["module"].automate_excel_refresh_links(excel_file_path, file_config, _worker["session"])
+    except Exception as e:
+        capture.records.append((f"❌ Error occurred while processing file: {str(e)}", "ERROR"))
+        success = False
+    finally:
+        logger.removeHandler(capture)
+    return bool(success), capture.records, os.getpid(), link_cache.export() if link_cache is not None else ({}, 0, 0)
+
+
+class WorkbookPool:
+    def __init__(self, updating_script_path, max_workers, base_directory=None):
+        self.updating_script_path = updating_script_path
+        self.base_directory = base_directory
+        self.max_workers = max(int(max_workers), 1)
+        self.worker_pids = set()
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(self.updating_script_path, self.base_directory)
+            )
+        return self._pool
+
+    def run_wave(self, jobs, link_cache=None):
+        # jobs: [(excel_file_path, file_config)]；按 jobs 次序回傳 [(success, [(message, message_type)])]
+        link_sources = link_cache.snapshot() if link_cache is not None else None
+        futures = [self._get_pool().submit(_refresh_in_worker, excel_file_path, file_config, link_sources)
+                   for excel_file_path, file_config in jobs]
+        results = []
+        broken = False
+        for future in futures:
+            try:
+                success, records, pid, link_export = future.result()
+                self.worker_pids.add(pid)
+                if link_cache is not None:
+                    link_cache.merge(*link_export)
+            except BrokenProcessPool as e:
+                broken = True
+                # worker process 崩潰（例如 Excel COM 出錯）：今個 wave 未完成的檔案當失敗，下個 wave 重建 pool
+                success, records = False, [(f"❌ Workbook worker process crashed: {str(e)}", "ERROR")]
+            except Exception as e:
+                success, records = False, [(f"❌ Error occurred while processing file: {str(e)}", "ERROR")]
+            results.append((success, records))
+        if broken:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        return results
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None